@@ -135,7 +135,7 @@ async def get_digilocker_auth_url(
         await guest_service.get_guest(guest_id)
         
         # Generate auth URL
-        auth_url = await digilocker_service.get_authorization_url(guest_id)
+        auth_url = digilocker_service.get_auth_url(str(guest_id))  # guest_id is the OAuth state
         return {"auth_url": auth_url}
     except NotFoundError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
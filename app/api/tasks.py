@@ -1,8 +1,9 @@
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session
 
-from app.db.database import get_session
+from app.db.database import engine, get_session
 from app.schemas.schemas import BackgroundTaskRead, BackgroundTaskList
 from app.services.task_service import TaskService
 from app.auth.auth import get_current_active_user, get_current_admin_user
@@ -25,6 +26,21 @@ async def get_tasks(
     tasks = await task_service.get_tasks(status, task_type, limit, skip)
     return {"tasks": tasks, "total": len(tasks)}
 
+@router.get("/export")
+async def export_tasks(
+    status: Optional[str] = None,
+    task_type: Optional[str] = None,
+    _: dict = Depends(get_current_admin_user)
+):
+    """Stream background tasks as newline-delimited JSON with optional filtering (admin only)"""
+    def rows():
+        # Own session: the request session is closed before the body is streamed
+        with Session(engine) as session:
+            for task in TaskService(session).iter_tasks(status, task_type):
+                yield BackgroundTaskRead.model_validate(task, from_attributes=True).model_dump_json() + "\n"
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @router.get("/{task_id}", response_model=BackgroundTaskRead)
 async def get_task(
     task_id: str,
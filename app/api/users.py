@@ -1,9 +1,11 @@
+import asyncio
 from typing import List, Optional
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session
 
-from app.db.database import get_session
+from app.db.database import engine, get_session
 from app.schemas.schemas import UserCreate, UserRead, UserUpdate, Token, UserList
 from app.services.user_service import UserService
 from app.services.email_service import EmailService
@@ -59,6 +61,19 @@ async def get_users(
     users = await user_service.get_users(limit, skip)
     return {"users": users, "total": len(users)}
 
+@router.get("/export")
+async def export_users(
+    current_user: dict = Depends(get_current_admin_user)
+):
+    """Stream all users as newline-delimited JSON (admin only)"""
+    def rows():
+        # Own session: the request session is closed before the body is streamed
+        with Session(engine) as session:
+            for user in UserService(session).iter_users():
+                yield UserRead.model_validate(user, from_attributes=True).model_dump_json() + "\n"
+    
+    return StreamingResponse(rows(), media_type="application/x-ndjson")
+
 @router.get("/me", response_model=UserRead)
 async def get_current_user_info(
     session: Session = Depends(get_session),
@@ -218,7 +233,7 @@ async def change_password(
             raise NotFoundError("User not found")
         
         # Verify current password
-        if not verify_password(current_password, user.hashed_password):
+        if not await asyncio.to_thread(verify_password, current_password, user.hashed_password):
             raise UnauthorizedError("Current password is incorrect")
         
         # Update password
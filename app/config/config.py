@@ -59,16 +59,23 @@ class Settings(BaseSettings):
     TESSERACT_CMD: str = os.getenv("TESSERACT_CMD", "tesseract")
     OCR_UPLOAD_DIR: str = os.getenv("OCR_UPLOAD_DIR", "./uploads/ocr")
     OCR_DEFAULT_LANGUAGE: str = os.getenv("OCR_DEFAULT_LANGUAGE", "eng")
+    OCR_PSM: int = int(os.getenv("OCR_PSM", "6"))  # Tesseract page segmentation mode
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", str(os.cpu_count() or 1)))
     
     # ML Model Settings
     ML_MODEL_DIR: str = os.getenv("ML_MODEL_DIR", "./ml_models")
     ML_MIN_DATA_POINTS: int = int(os.getenv("ML_MIN_DATA_POINTS", "50"))
     ML_RETRAIN_THRESHOLD: int = int(os.getenv("ML_RETRAIN_THRESHOLD", "20"))
     
+    # Background Task Settings
+    TASK_CONCURRENCY: int = int(os.getenv("TASK_CONCURRENCY", "4"))  # tasks run at once per batch
+    
     # Backup Settings
     BACKUP_ENABLED: bool = os.getenv("BACKUP_ENABLED", "true").lower() == "true"
     BACKUP_DIR: str = os.getenv("BACKUP_DIR", "./backups")
     BACKUP_INTERVAL_HOURS: int = int(os.getenv("BACKUP_INTERVAL_HOURS", "24"))
+    # gzip level for backup archives: 1 favours speed, 6 is gzip's default compromise, 9 only buys size
+    BACKUP_COMPRESSLEVEL: int = int(os.getenv("BACKUP_COMPRESSLEVEL", "1"))
     
     # Email Settings
     SMTP_SERVER: Optional[str] = os.getenv("SMTP_SERVER")
@@ -140,10 +147,14 @@ except Exception as e:
         RATE_LIMIT_WINDOW_SECONDS = 60
         TESSERACT_CMD = "tesseract"
         OCR_DEFAULT_LANGUAGE = "eng"
+        OCR_PSM = 6
+        OCR_WORKERS = os.cpu_count() or 1
         ML_MIN_DATA_POINTS = 50
         ML_RETRAIN_THRESHOLD = 20
+        TASK_CONCURRENCY = 4
         BACKUP_ENABLED = True
         BACKUP_INTERVAL_HOURS = 24
+        BACKUP_COMPRESSLEVEL = 1
         LOG_LEVEL = "INFO"
         LOG_FILE = "./logs/app.log"
         INITIAL_ADMIN_EMAIL = "admin@example.com"
@@ -8,6 +8,10 @@ from app.config import settings
 from app.db.database import init_db
 from app.middleware.middleware import setup_middleware
 from app.utils.logger import setup_logging
+from app.services.digilocker_service import DigiLockerService
+from app.services.email_service import EmailService
+from app.services.ocr_service import OCRService
+from app.services.prediction_service import PredictionService
 
 # Import API routers
 from app.api.users import router as users_router, auth_router
@@ -59,6 +63,14 @@ async def on_startup():
     """Initialize database and create tables on startup"""
     await init_db()
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    """Release shared connections and worker pools on shutdown"""
+    await DigiLockerService.aclose()
+    await EmailService.aclose()
+    await OCRService.aclose()
+    await PredictionService.aclose()
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -1,6 +1,7 @@
 from sqlmodel import SQLModel, Field, Relationship
+from sqlalchemy import Index, text
 from typing import Optional, List
-from datetime import datetime
+from datetime import datetime, date
 
 # Base model for common fields
 class TimeStampModel(SQLModel):
@@ -11,8 +12,8 @@ class TimeStampModel(SQLModel):
 class Guest(TimeStampModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
     name: str
-    phone: Optional[str] = None
-    email: Optional[str] = None
+    phone: Optional[str] = Field(default=None, index=True)
+    email: Optional[str] = Field(default=None, index=True)
     id_type: Optional[str] = None  # Aadhaar/PAN/Passport
     id_number: Optional[str] = None
     is_premium: bool = False
@@ -28,9 +29,14 @@ class Guest(TimeStampModel, table=True):
 
 # Room model
 class Room(TimeStampModel, table=True):
+    __table_args__ = (
+        # Serves the per-type occupancy GROUP BY
+        Index("ix_room_type_occupied", "room_type", "occupied"),
+    )
+    
     number: int = Field(primary_key=True)
     room_type: str = "Standard"  # Standard/Premium/Suite
-    occupied: bool = False
+    occupied: bool = Field(default=False, index=True)
     current_guest_id: Optional[int] = None
     rate_per_night: float = 1000.0
     notes: Optional[str] = None
@@ -40,17 +46,27 @@ class Room(TimeStampModel, table=True):
 
 # Booking model
 class Booking(TimeStampModel, table=True):
+    __table_args__ = (
+        # Partial index for active (not checked out) bookings
+        Index(
+            "ix_booking_active_checkin_at", "checkin_at",
+            postgresql_where=text("checkout_at IS NULL"),
+            sqlite_where=text("checkout_at IS NULL")
+        ),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     guest_id: int = Field(foreign_key="guest.id")
     room_number: int = Field(foreign_key="room.number")
-    checkin_at: datetime = Field(default_factory=datetime.utcnow)
-    checkout_at: Optional[datetime] = None
+    checkin_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    checkout_at: Optional[datetime] = Field(default=None, index=True)
     price: Optional[float] = None
     invoice_path: Optional[str] = None
     subtotal: Optional[float] = None
     tax_total: Optional[float] = None
     discount_total: Optional[float] = None
     grand_total: Optional[float] = None
+    duration_days: Optional[int] = Field(default=None, index=True)  # set on checkout
     
     # Relationships
     guest: Guest = Relationship(back_populates="bookings")
@@ -59,6 +75,12 @@ class Booking(TimeStampModel, table=True):
     taxes: List["InvoiceTax"] = Relationship(back_populates="booking")
     discounts: List["InvoiceDiscount"] = Relationship(back_populates="booking")
 
+# Daily Revenue model (per-day totals of checked-out bookings, filled lazily)
+class DailyRevenue(TimeStampModel, table=True):
+    day: date = Field(primary_key=True)
+    total: float = 0.0
+    bookings: int = 0
+
 # Invoice Line Item model
 class InvoiceLineItem(TimeStampModel, table=True):
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -110,6 +132,13 @@ class PredictionDataPoint(TimeStampModel, table=True):
 
 # Background Task model
 class BackgroundTask(TimeStampModel, table=True):
+    __table_args__ = (
+        # Dispatch: WHERE status = 'pending' ORDER BY created_at LIMIT n
+        Index("ix_bgtask_status_created", "status", "created_at"),
+        # Cleanup: WHERE status IN (...) AND completed_at < cutoff
+        Index("ix_bgtask_status_completed", "status", "completed_at"),
+    )
+    
     id: Optional[int] = Field(default=None, primary_key=True)
     task_id: str = Field(unique=True)
     task_type: str  # ocr, digilocker_fetch, train_model, etc.
@@ -129,4 +158,10 @@ class User(TimeStampModel, table=True):
     hashed_password: str
     is_active: bool = True
     is_superuser: bool = False
-    role: str = "receptionist"  # admin, receptionist, etc.
\ No newline at end of file
+    role: str = "receptionist"  # admin, receptionist, etc.
+
+# Password reset token model, shared by all workers
+class PasswordResetToken(TimeStampModel, table=True):
+    token: str = Field(primary_key=True)
+    user_id: int = Field(foreign_key="user.id", index=True)
+    expires_at: datetime
\ No newline at end of file
@@ -195,6 +195,7 @@ class BookingInDB(BookingBase):
     tax_total: Optional[float] = None
     discount_total: Optional[float] = None
     grand_total: Optional[float] = None
+    duration_days: Optional[int] = None
     created_at: datetime
     updated_at: Optional[datetime] = None
 
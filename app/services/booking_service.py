@@ -1,20 +1,73 @@
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Tuple, Set, AsyncIterator
+from contextlib import asynccontextmanager
+from functools import cached_property
 from sqlmodel import Session, select, and_, or_
-from datetime import datetime, timedelta
+from sqlalchemy import delete, func, Date
+from sqlalchemy.dialects import postgresql, sqlite
+from datetime import datetime, date, timedelta
 
-from app.models.models import Booking, Guest, Room, InvoiceLineItem, InvoiceTax, InvoiceDiscount
-from app.schemas.schemas import BookingCreate, BookingUpdate
+from app.models.models import Booking, Guest, Room, InvoiceLineItem, InvoiceTax, InvoiceDiscount, DailyRevenue
+from app.schemas.schemas import BookingCreate, BookingUpdate, InvoiceTaxBase, InvoiceDiscountBase
 from app.utils.errors import NotFoundError, ConflictError, BadRequestError
 from app.utils.helpers import get_current_time
 from app.services.room_service import RoomService
 from app.services.guest_service import GuestService
 from loguru import logger
 
+# Inserts that can skip rows another worker already cached (ON CONFLICT DO NOTHING)
+_CONFLICT_SAFE_INSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
 class BookingService:
     def __init__(self, session: Session):
         self.session = session
-        self.room_service = RoomService(session)
-        self.guest_service = GuestService(session)
+        
+        # Bookings whose totals must be recalculated when the outermost totals_tx exits
+        self._dirty_booking_ids: Set[int] = set()
+        self._totals_tx_depth = 0
+    
+    @cached_property
+    def room_service(self) -> RoomService:
+        """Room service, created on first use"""
+        return RoomService(self.session)
+    
+    @cached_property
+    def guest_service(self) -> GuestService:
+        """Guest service, created on first use"""
+        return GuestService(self.session)
+    
+    @asynccontextmanager
+    async def totals_tx(self, booking_id: int) -> AsyncIterator[None]:
+        """Batch invoice mutations into one transaction and recalculate booking totals once on exit"""
+        # Fail before any mutation runs, not when totals are recalculated
+        await self.get_booking(booking_id)
+        
+        self._totals_tx_depth += 1
+        self._dirty_booking_ids.add(booking_id)
+        try:
+            yield
+        except BaseException:
+            # Mutations inside the batch were only flushed, so a failure undoes the whole batch
+            self._totals_tx_depth -= 1
+            if self._totals_tx_depth == 0:
+                self._dirty_booking_ids.clear()
+                self.session.rollback()
+            raise
+        
+        self._totals_tx_depth -= 1
+        if self._totals_tx_depth == 0:
+            dirty_booking_ids, self._dirty_booking_ids = self._dirty_booking_ids, set()
+            for dirty_id in dirty_booking_ids:
+                # Bookings deleted inside the batch have nothing left to total
+                if self.session.get(Booking, dirty_id) is not None:
+                    await self.recalculate_booking_totals(dirty_id)
+            self.session.commit()
+    
+    def _commit_unless_batched(self) -> None:
+        """Commit invoice changes, or only flush them while a totals_tx batch is open"""
+        if self._totals_tx_depth:
+            self.session.flush()
+        else:
+            self.session.commit()
     
     async def create_booking(self, booking_data: BookingCreate) -> Booking:
         """Create a new booking"""
@@ -115,7 +168,7 @@ class BookingService:
             query = query.where(Booking.checkin_at <= to_date)
         
         # Get total count before pagination
-        total_count = len(self.session.exec(query).all())
+        total_count = self.session.exec(select(func.count()).select_from(query.subquery())).one()
         
         # Apply pagination
         query = query.offset(skip).limit(limit)
@@ -128,7 +181,7 @@ class BookingService:
                             room_number: Optional[int] = None,
                             active_only: bool = False) -> int:
         """Count total bookings with optional filters"""
-        query = select(Booking)
+        query = select(func.count()).select_from(Booking)
         
         # Apply guest filter if provided
         if guest_id:
@@ -142,17 +195,26 @@ class BookingService:
         if active_only:
             query = query.where(Booking.checkout_at == None)
         
-        return len(self.session.exec(query).all())
+        return self.session.exec(query).one()
     
     async def update_booking(self, booking_id: int, booking_data: BookingUpdate) -> Booking:
         """Update booking information"""
         booking = await self.get_booking(booking_id)
+        previous_checkout_at = booking.checkout_at
         
         # Update booking fields if provided
         booking_data_dict = booking_data.dict(exclude_unset=True)
         for key, value in booking_data_dict.items():
             setattr(booking, key, value)
         
+        # Keep the stored stay duration in sync with checkout_at
+        if booking.checkout_at:
+            booking.duration_days = (booking.checkout_at - booking.checkin_at).days or 1
+        
+        # Drop cached revenue for any checkout day this update touches
+        self._invalidate_daily_revenue(previous_checkout_at)
+        self._invalidate_daily_revenue(booking.checkout_at)
+        
         # Handle checkout if provided
         if booking_data.checkout_at and not booking.checkout_at:
             # Vacate the room
@@ -161,8 +223,7 @@ class BookingService:
             # If price not provided, calculate based on duration
             if not booking_data.price and not booking.price:
                 room = await self.room_service.get_room(booking.room_number)
-                duration = (booking.checkout_at - booking.checkin_at).days or 1
-                booking.price = room.rate_per_night * duration
+                booking.price = room.rate_per_night * booking.duration_days
         
         # Update updated_at timestamp
         booking.updated_at = get_current_time()
@@ -217,6 +278,7 @@ class BookingService:
         
         # Update booking
         booking.checkout_at = checkout_time
+        booking.duration_days = duration
         booking.updated_at = checkout_time
         
         # Vacate the room
@@ -253,6 +315,9 @@ class BookingService:
             except Exception as e:
                 logger.warning(f"Failed to vacate room during booking deletion: {str(e)}")
         
+        # Drop cached revenue for the checkout day
+        self._invalidate_daily_revenue(booking.checkout_at)
+        
         # Delete related invoice items
         await self.delete_all_invoice_items(booking_id)
         
@@ -277,13 +342,13 @@ class BookingService:
         )
         
         self.session.add(line_item)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Added invoice item to booking {booking_id}: {item_data.description}")
-        return await self.get_booking(booking_id)
+        return booking
     
     async def remove_invoice_item(self, booking_id: int, item_id: int) -> Booking:
         """Remove invoice line item from booking"""
@@ -297,13 +362,13 @@ class BookingService:
             raise BadRequestError("Cannot delete room charge for active booking")
         
         self.session.delete(line_item)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Removed invoice item {item_id} from booking {booking_id}")
-        return await self.get_booking(booking_id)
+        return booking
     
     async def add_line_item(self, booking_id: int, description: str, quantity: float, unit_price: float, item_type: str = "extra") -> InvoiceLineItem:
         """Add line item to booking invoice"""
@@ -321,11 +386,11 @@ class BookingService:
         )
         
         self.session.add(line_item)
-        self.session.commit()
+        self._commit_unless_batched()
         self.session.refresh(line_item)
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        await self._totals_changed(booking_id)
         
         logger.info(f"Added line item to booking {booking_id}: {description}")
         return line_item
@@ -349,34 +414,21 @@ class BookingService:
             raise BadRequestError("Cannot delete room charge for active booking")
         
         self.session.delete(line_item)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        await self._totals_changed(booking_id)
         
         logger.info(f"Deleted line item {line_item_id} from booking {booking_id}")
     
     async def delete_all_invoice_items(self, booking_id: int) -> None:
         """Delete all invoice items for a booking"""
-        # Delete line items
-        line_items_query = select(InvoiceLineItem).where(InvoiceLineItem.booking_id == booking_id)
-        line_items = self.session.exec(line_items_query).all()
-        for item in line_items:
-            self.session.delete(item)
-        
-        # Delete taxes
-        taxes_query = select(InvoiceTax).where(InvoiceTax.booking_id == booking_id)
-        taxes = self.session.exec(taxes_query).all()
-        for tax in taxes:
-            self.session.delete(tax)
-        
-        # Delete discounts
-        discounts_query = select(InvoiceDiscount).where(InvoiceDiscount.booking_id == booking_id)
-        discounts = self.session.exec(discounts_query).all()
-        for discount in discounts:
-            self.session.delete(discount)
+        # Bulk delete line items, taxes and discounts without loading rows
+        self.session.exec(delete(InvoiceLineItem).where(InvoiceLineItem.booking_id == booking_id))
+        self.session.exec(delete(InvoiceTax).where(InvoiceTax.booking_id == booking_id))
+        self.session.exec(delete(InvoiceDiscount).where(InvoiceDiscount.booking_id == booking_id))
         
-        self.session.commit()
+        self._commit_unless_batched()
         logger.info(f"Deleted all invoice items for booking {booking_id}")
     
     # Tax methods
@@ -400,13 +452,13 @@ class BookingService:
         )
         
         self.session.add(tax)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Added tax to booking {booking_id}: {tax_data.name} at {tax_data.rate}%")
-        return await self.get_booking(booking_id)
+        return booking
     
     async def remove_tax(self, booking_id: int, tax_id: int) -> Booking:
         """Remove tax from booking invoice"""
@@ -415,43 +467,17 @@ class BookingService:
             raise NotFoundError(f"Tax with ID {tax_id} not found")
         
         self.session.delete(tax)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Deleted tax {tax_id} from booking {booking_id}")
-        return await self.get_booking(booking_id)
+        return booking
     
-    async def add_tax(self, booking_id: int, name: str, rate: float) -> InvoiceTax:
-        """Add tax to booking invoice"""
-        booking = await self.get_booking(booking_id)
-        
-        # Calculate tax amount
-        if not booking.subtotal:
-            await self.recalculate_booking_totals(booking_id)
-            self.session.refresh(booking)
-        
-        tax_amount = booking.subtotal * (rate / 100)
-        
-        # Create tax
-        tax = InvoiceTax(
-            booking_id=booking_id,
-            name=name,
-            rate=rate,
-            amount=tax_amount,
-            created_at=get_current_time()
-        )
-        
-        self.session.add(tax)
-        self.session.commit()
-        self.session.refresh(tax)
-        
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
-        
-        logger.info(f"Added tax to booking {booking_id}: {name} at {rate}%")
-        return tax
+    async def add_tax_simple(self, booking_id: int, name: str, rate: float) -> Booking:
+        """Add tax to booking invoice from plain values"""
+        return await self.add_tax(booking_id, InvoiceTaxBase(name=name, rate=rate))
     
     async def get_taxes(self, booking_id: int) -> List[InvoiceTax]:
         """Get all taxes for a booking"""
@@ -467,10 +493,10 @@ class BookingService:
         booking_id = tax.booking_id
         
         self.session.delete(tax)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        await self._totals_changed(booking_id)
         
         logger.info(f"Deleted tax {tax_id} from booking {booking_id}")
     
@@ -502,13 +528,13 @@ class BookingService:
         )
         
         self.session.add(discount)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Added discount to booking {booking_id}: {discount_data.name}")
-        return await self.get_booking(booking_id)
+        return booking
     
     async def remove_discount(self, booking_id: int, discount_id: int) -> Booking:
         """Remove discount from booking invoice"""
@@ -517,49 +543,17 @@ class BookingService:
             raise NotFoundError(f"Discount with ID {discount_id} not found")
         
         self.session.delete(discount)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        booking = await self._totals_changed(booking_id)
         
         logger.info(f"Deleted discount {discount_id} from booking {booking_id}")
-        return await self.get_booking(booking_id)
+        return booking
     
-    async def add_discount(self, booking_id: int, name: str, amount: Optional[float] = None, percentage: Optional[float] = None) -> InvoiceDiscount:
-        """Add discount to booking invoice"""
-        if amount is None and percentage is None:
-            raise BadRequestError("Either amount or percentage must be provided")
-        
-        booking = await self.get_booking(booking_id)
-        
-        # Calculate discount amount
-        if not booking.subtotal:
-            await self.recalculate_booking_totals(booking_id)
-            self.session.refresh(booking)
-        
-        if percentage is not None:
-            discount_amount = booking.subtotal * (percentage / 100)
-        else:
-            discount_amount = amount or 0
-        
-        # Create discount
-        discount = InvoiceDiscount(
-            booking_id=booking_id,
-            name=name,
-            amount=discount_amount,
-            percentage=percentage,
-            created_at=get_current_time()
-        )
-        
-        self.session.add(discount)
-        self.session.commit()
-        self.session.refresh(discount)
-        
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
-        
-        logger.info(f"Added discount to booking {booking_id}: {name}")
-        return discount
+    async def add_discount_simple(self, booking_id: int, name: str, amount: Optional[float] = None, percentage: Optional[float] = None) -> Booking:
+        """Add discount to booking invoice from plain values"""
+        return await self.add_discount(booking_id, InvoiceDiscountBase(name=name, amount=amount, percentage=percentage))
     
     async def get_discounts(self, booking_id: int) -> List[InvoiceDiscount]:
         """Get all discounts for a booking"""
@@ -575,14 +569,21 @@ class BookingService:
         booking_id = discount.booking_id
         
         self.session.delete(discount)
-        self.session.commit()
+        self._commit_unless_batched()
         
-        # Recalculate totals
-        await self.recalculate_booking_totals(booking_id)
+        # Recalculate totals (deferred inside totals_tx)
+        await self._totals_changed(booking_id)
         
         logger.info(f"Deleted discount {discount_id} from booking {booking_id}")
     
     # Helper methods
+    async def _totals_changed(self, booking_id: int) -> Booking:
+        """Recalculate totals now, or mark the booking dirty inside totals_tx"""
+        if self._totals_tx_depth:
+            self._dirty_booking_ids.add(booking_id)
+            return await self.get_booking(booking_id)
+        return await self.recalculate_booking_totals(booking_id)
+    
     async def recalculate_booking_totals(self, booking_id: int) -> Booking:
         """Recalculate booking totals"""
         booking = await self.get_booking(booking_id)
@@ -620,8 +621,11 @@ class BookingService:
         booking.grand_total = grand_total
         booking.updated_at = get_current_time()
         
+        # Totals of a checked-out booking feed the cached daily revenue
+        self._invalidate_daily_revenue(booking.checkout_at)
+        
         self.session.add(booking)
-        self.session.commit()
+        self._commit_unless_batched()
         self.session.refresh(booking)
         
         return booking
@@ -656,34 +660,27 @@ class BookingService:
         if not start_date:
             start_date = end_date - timedelta(days=30)
         
-        # Query for bookings in date range
-        query = select(Booking).where(
-            and_(
-                Booking.checkin_at >= start_date,
-                or_(
-                    Booking.checkout_at <= end_date,
-                    Booking.checkout_at == None
-                )
+        # Aggregate bookings in date range in a single query
+        query = select(
+            func.count(Booking.id),
+            func.count(Booking.checkout_at),
+            func.coalesce(func.sum(Booking.grand_total), 0),
+            func.avg(Booking.duration_days)
+        ).where(
+            Booking.checkin_at >= start_date
+        ).where(
+            # Active bookings are served by the partial index on checkin_at
+            or_(
+                Booking.checkout_at.is_(None),
+                Booking.checkout_at <= end_date
             )
         )
-        bookings = self.session.exec(query).all()
+        total_bookings, completed_bookings, total_revenue, avg_stay_duration = self.session.exec(query).one()
         
         # Calculate statistics
-        total_bookings = len(bookings)
-        completed_bookings = sum(1 for b in bookings if b.checkout_at is not None)
         active_bookings = total_bookings - completed_bookings
-        
-        total_revenue = sum(b.grand_total or 0 for b in bookings if b.grand_total is not None)
         avg_booking_value = total_revenue / total_bookings if total_bookings > 0 else 0
-        
-        # Calculate average stay duration for completed bookings
-        stay_durations = []
-        for booking in bookings:
-            if booking.checkout_at:
-                duration = (booking.checkout_at - booking.checkin_at).days or 1
-                stay_durations.append(duration)
-        
-        avg_stay_duration = sum(stay_durations) / len(stay_durations) if stay_durations else 0
+        avg_stay_duration = float(avg_stay_duration or 0)
         
         return {
             "start_date": start_date,
@@ -698,37 +695,35 @@ class BookingService:
     
     async def get_revenue_stats(self, start_date: Optional[datetime] = None, end_date: Optional[datetime] = None) -> Dict[str, Any]:
         """Get revenue statistics for a date range"""
+        # The default range and the cache boundary share one UTC clock
+        today = get_current_time().date()
+        
         # Set default date range if not provided
         if not end_date:
-            end_date = datetime.now().date()
+            end_date = today
         if not start_date:
             start_date = end_date - timedelta(days=30)
         
-        # Query for completed bookings in date range
-        query = select(Booking).where(
-            and_(
-                Booking.checkout_at >= start_date,
-                Booking.checkout_at <= end_date,
-                Booking.checkout_at != None
-            )
-        )
-        bookings = self.session.exec(query).all()
+        start_day = start_date.date() if isinstance(start_date, datetime) else start_date
+        end_day = end_date.date() if isinstance(end_date, datetime) else end_date
+        
+        # Past days never change once cached; today's partial is always computed live
+        daily_totals = {}
+        cached_end = min(end_day, today - timedelta(days=1))
+        if start_day <= cached_end:
+            daily_totals.update(self._get_cached_daily_revenue(start_day, cached_end))
+        if start_day <= today <= end_day:
+            daily_totals.update(self._aggregate_daily_revenue(today, today))
         
         # Calculate revenue statistics
-        total_revenue = sum(b.grand_total or 0 for b in bookings if b.grand_total is not None)
-        total_bookings = len(bookings)
+        total_revenue = sum(total for total, _ in daily_totals.values())
+        total_bookings = sum(count for _, count in daily_totals.values())
         avg_booking_value = total_revenue / total_bookings if total_bookings > 0 else 0
         
-        # Daily revenue breakdown
-        daily_revenue = {}
-        for booking in bookings:
-            checkout_date = booking.checkout_at.date()
-            if checkout_date not in daily_revenue:
-                daily_revenue[checkout_date] = 0
-            daily_revenue[checkout_date] += booking.grand_total or 0
-        
-        # Sort daily revenue by date
-        sorted_daily_revenue = sorted(daily_revenue.items())
+        # Sort daily revenue by date, skipping days without checkouts
+        sorted_daily_revenue = sorted(
+            (day, total) for day, (total, count) in daily_totals.items() if count
+        )
         
         return {
             "start_date": start_date,
@@ -737,4 +732,53 @@ class BookingService:
             "total_bookings": total_bookings,
             "avg_booking_value": avg_booking_value,
             "daily_revenue": sorted_daily_revenue
-        }
\ No newline at end of file
+        }
+    
+    def _aggregate_daily_revenue(self, start_day: date, end_day: date) -> Dict[date, Tuple[float, int]]:
+        """Sum checked-out booking totals per checkout day (inclusive range)"""
+        checkout_day = func.date(Booking.checkout_at, type_=Date)
+        query = select(
+            checkout_day,
+            func.coalesce(func.sum(Booking.grand_total), 0),
+            func.count(Booking.id)
+        ).where(
+            and_(
+                Booking.checkout_at >= datetime.combine(start_day, datetime.min.time()),
+                Booking.checkout_at < datetime.combine(end_day + timedelta(days=1), datetime.min.time())
+            )
+        ).group_by(checkout_day)
+        
+        return {day: (float(total), count) for day, total, count in self.session.exec(query)}
+    
+    def _get_cached_daily_revenue(self, start_day: date, end_day: date) -> Dict[date, Tuple[float, int]]:
+        """Read per-day revenue from the cache table, filling in any missing days"""
+        query = select(DailyRevenue).where(
+            and_(DailyRevenue.day >= start_day, DailyRevenue.day <= end_day)
+        )
+        cached = {row.day: (row.total, row.bookings) for row in self.session.exec(query)}
+        
+        num_days = (end_day - start_day).days + 1
+        missing = [start_day + timedelta(days=i) for i in range(num_days)]
+        missing = [day for day in missing if day not in cached]
+        if missing:
+            computed = self._aggregate_daily_revenue(missing[0], missing[-1])
+            now = get_current_time()
+            rows = []
+            for day in missing:
+                total, count = computed.get(day, (0.0, 0))
+                rows.append({"day": day, "total": total, "bookings": count, "created_at": now})
+                cached[day] = (total, count)
+            
+            # Concurrent requests may fill the same days; whichever commits first keeps its row
+            insert = _CONFLICT_SAFE_INSERTS[self.session.get_bind().dialect.name]
+            self.session.exec(insert(DailyRevenue).on_conflict_do_nothing(index_elements=["day"]), params=rows)
+            self.session.commit()
+            logger.info(f"Cached daily revenue for {len(missing)} day(s) from {missing[0]} to {missing[-1]}")
+        
+        return cached
+    
+    def _invalidate_daily_revenue(self, checkout_at: Optional[datetime]) -> None:
+        """Drop the cached revenue row for a checkout day so it is recomputed"""
+        if checkout_at is None:
+            return
+        self.session.exec(delete(DailyRevenue).where(DailyRevenue.day == checkout_at.date()))
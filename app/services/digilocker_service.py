@@ -1,15 +1,82 @@
-import uuid
+import time
+import random
+import asyncio
 import aiohttp
-from typing import Dict, Any, List, Optional
-from datetime import datetime, timedelta
+import orjson
+from typing import Dict, Any, AsyncIterator, List, Optional, Tuple
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlencode, quote
+from sqlmodel import select
 
 from app.models.models import Guest, BackgroundTask
-from app.utils.helpers import get_current_time
+from app.utils.helpers import get_current_time, generate_task_id
 from app.config.config import settings
 from app.utils.errors import UnauthorizedError, ServerError
 from loguru import logger
 
+# In-process access token cache: guest_id -> (access_token, time.monotonic() expiry)
+_TOKEN_CACHE: Dict[int, Tuple[str, float]] = {}
+_TOKEN_CACHE_LOCK = asyncio.Lock()
+# Tokens closer than this to expiry are treated as a cache miss
+_TOKEN_EXPIRY_MARGIN_SECONDS = 60
+
+async def _get_cached_token(guest_id: int) -> Optional[str]:
+    """Get a cached access token that is not about to expire"""
+    async with _TOKEN_CACHE_LOCK:
+        entry = _TOKEN_CACHE.get(guest_id)
+        if entry is None:
+            return None
+        access_token, expires_at = entry
+        if expires_at - time.monotonic() < _TOKEN_EXPIRY_MARGIN_SECONDS:
+            del _TOKEN_CACHE[guest_id]
+            return None
+        return access_token
+
+async def _cache_token(guest_id: int, access_token: Optional[str], expires_in: float) -> None:
+    """Cache an access token for expires_in seconds"""
+    if not access_token:
+        return
+    async with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE[guest_id] = (access_token, time.monotonic() + expires_in)
+
+async def _invalidate_cached_token(guest_id: int) -> None:
+    """Remove a guest's cached access token"""
+    async with _TOKEN_CACHE_LOCK:
+        _TOKEN_CACHE.pop(guest_id, None)
+
+# At most this many DigiLocker requests are in flight per process
+_REQUEST_SLOTS = asyncio.Semaphore(20)
+# Throttled or unavailable responses are retried with exponential backoff
+_RETRY_STATUSES = (429, 503)
+_MAX_ATTEMPTS = 5
+_MAX_RETRY_DELAY_SECONDS = 30
+
+def _retry_delay(retry_after: Optional[str], attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After when present"""
+    if retry_after:
+        try:
+            return min(max(float(retry_after), 0), _MAX_RETRY_DELAY_SECONDS)
+        except ValueError:
+            try:
+                delay = (parsedate_to_datetime(retry_after) - datetime.now(timezone.utc)).total_seconds()
+                return min(max(delay, 0), _MAX_RETRY_DELAY_SECONDS)
+            except (TypeError, ValueError):
+                pass
+    return min(2 ** attempt + random.random(), _MAX_RETRY_DELAY_SECONDS)
+
+# Only this much of an error response body is read for logging
+_ERROR_BODY_LIMIT = 2048
+
+async def _read_error_text(response: aiohttp.ClientResponse) -> str:
+    """Read the start of an error response body without buffering all of it"""
+    return (await response.content.read(_ERROR_BODY_LIMIT)).decode("utf-8", errors="replace")
+
 class DigiLockerService:
+    # Shared across instances so pooled keep-alive connections are reused between requests
+    _http: Optional[aiohttp.ClientSession] = None
+    
     def __init__(self, session=None):
         self.session = session
         self.client_id = settings.DIGILOCKER_CLIENT_ID
@@ -19,28 +86,59 @@ class DigiLockerService:
         self.token_url = "https://api.digitallocker.gov.in/public/oauth2/1/token"
         self.issued_documents_url = "https://api.digitallocker.gov.in/public/oauth2/1/files/issued"
         self.uploaded_documents_url = "https://api.digitallocker.gov.in/public/oauth2/1/files/uploaded"
+        
+        # Invariant part of the authorization URL; only state varies per call
+        self._auth_prefix = f"{self.auth_url}?" + urlencode({
+            "response_type": "code",
+            "client_id": self.client_id,
+            "redirect_uri": self.redirect_uri
+        }, quote_via=quote) + "&state="
+    
+    async def _get_http(self) -> aiohttp.ClientSession:
+        """Get the shared HTTP client session, creating it on first use"""
+        cls = type(self)
+        if cls._http is None or cls._http.closed:
+            cls._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                    force_close=False
+                ),
+                timeout=aiohttp.ClientTimeout(total=30)
+            )
+        return cls._http
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close the shared HTTP client session"""
+        if cls._http is not None and not cls._http.closed:
+            await cls._http.close()
+        cls._http = None
+    
+    @asynccontextmanager
+    async def _request(self, method: str, url: str, **kwargs) -> AsyncIterator[aiohttp.ClientResponse]:
+        """Send a DigiLocker request, retrying throttled responses with backoff"""
+        session = await self._get_http()
+        for attempt in range(_MAX_ATTEMPTS):
+            async with _REQUEST_SLOTS:
+                async with session.request(method, url, **kwargs) as response:
+                    if response.status not in _RETRY_STATUSES or attempt == _MAX_ATTEMPTS - 1:
+                        yield response
+                        return
+                    delay = _retry_delay(response.headers.get("Retry-After"), attempt)
+            
+            # Sleep outside the semaphore so waiting retries don't hold a slot
+            logger.warning(f"DigiLocker returned {response.status} for {url}, retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
     
     def get_auth_url(self, state: str) -> str:
         """Generate DigiLocker authorization URL"""
-        auth_params = {
-            "response_type": "code",
-            "client_id": self.client_id,
-            "redirect_uri": self.redirect_uri,
-            "state": state
-        }
-        
-        # Build URL with query parameters
-        query_string = "&".join([f"{key}={value}" for key, value in auth_params.items()])
-        auth_url = f"{self.auth_url}?{query_string}"
+        auth_url = self._auth_prefix + quote(state, safe="")
         
         logger.info(f"Generated DigiLocker auth URL with state: {state}")
         return auth_url
     
-    async def get_authorization_url(self, guest_id: int) -> str:
-        """Generate DigiLocker authorization URL for a specific guest"""
-        state = str(guest_id)  # Use guest_id as state for security
-        return self.get_auth_url(state)
-    
     async def exchange_code_for_token(self, code: str) -> Dict[str, Any]:
         """Exchange authorization code for access token"""
         token_params = {
@@ -52,16 +150,15 @@ class DigiLockerService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.token_url, data=token_params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"DigiLocker token exchange failed: {error_text}")
-                        raise UnauthorizedError("Failed to exchange code for token")
-                    
-                    token_data = await response.json()
-                    logger.info("Successfully exchanged code for DigiLocker token")
-                    return token_data
+            async with self._request("POST", self.token_url, data=token_params) as response:
+                if response.status != 200:
+                    error_text = await _read_error_text(response)
+                    logger.error(f"DigiLocker token exchange failed: {error_text}")
+                    raise UnauthorizedError("Failed to exchange code for token")
+                
+                token_data = await response.json(loads=orjson.loads)
+                logger.info("Successfully exchanged code for DigiLocker token")
+                return token_data
         except aiohttp.ClientError as e:
             logger.error(f"DigiLocker API error: {str(e)}")
             raise ServerError(f"DigiLocker API error: {str(e)}")
@@ -76,16 +173,15 @@ class DigiLockerService:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(self.token_url, data=refresh_params) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"DigiLocker token refresh failed: {error_text}")
-                        raise UnauthorizedError("Failed to refresh token")
-                    
-                    token_data = await response.json()
-                    logger.info("Successfully refreshed DigiLocker token")
-                    return token_data
+            async with self._request("POST", self.token_url, data=refresh_params) as response:
+                if response.status != 200:
+                    error_text = await _read_error_text(response)
+                    logger.error(f"DigiLocker token refresh failed: {error_text}")
+                    raise UnauthorizedError("Failed to refresh token")
+                
+                token_data = await response.json(loads=orjson.loads)
+                logger.info("Successfully refreshed DigiLocker token")
+                return token_data
         except aiohttp.ClientError as e:
             logger.error(f"DigiLocker API error: {str(e)}")
             raise ServerError(f"DigiLocker API error: {str(e)}")
@@ -98,95 +194,98 @@ class DigiLockerService:
         
         # Calculate token expiry time
         expires_in = token_data.get("expires_in", 3600)  # Default to 1 hour if not provided
-        expiry_time = get_current_time() + timedelta(seconds=expires_in)
+        now = get_current_time()
+        expiry_time = now + timedelta(seconds=expires_in)
         
         # Update guest record
         guest.digilocker_token = token_data.get("access_token")
         guest.digilocker_refresh_token = token_data.get("refresh_token")
         guest.digilocker_token_expiry = expiry_time
-        guest.updated_at = get_current_time()
+        guest.updated_at = now
         
-        self.session.add(guest)
+        # guest is already tracked by the session; expired fields reload on access
         self.session.commit()
-        self.session.refresh(guest)
+        
+        await _cache_token(guest_id, guest.digilocker_token, expires_in)
         
         logger.info(f"Updated DigiLocker tokens for guest: {guest_id}")
         return guest
     
     async def create_fetch_documents_task(self, guest_id: int) -> BackgroundTask:
         """Create a background task for fetching DigiLocker documents"""
-        task_id = str(uuid.uuid4())
+        task_id = generate_task_id()
         
         task = BackgroundTask(
             task_id=task_id,
             task_type="digilocker_fetch",
             status="pending",
-            result=f"{{\"guest_id\": {guest_id}}}",
+            result=orjson.dumps({"guest_id": guest_id}).decode(),
             created_at=get_current_time()
         )
         
         self.session.add(task)
         self.session.commit()
-        self.session.refresh(task)
         
         logger.info(f"Created DigiLocker fetch task: {task_id} for guest: {guest_id}")
         return task
     
     async def fetch_documents(self, task_id: str, guest_id: int) -> Dict[str, Any]:
         """Fetch documents from DigiLocker"""
-        # Update task status
-        task = self.session.get(BackgroundTask, task_id)
-        if not task:
+        # Load the task and the guest in one round trip
+        query = (
+            select(BackgroundTask, Guest)
+            .outerjoin(Guest, Guest.id == guest_id)
+            .where(BackgroundTask.task_id == task_id)
+        )
+        row = self.session.exec(query).first()
+        if not row:
             raise ValueError(f"Task not found: {task_id}")
+        task, guest = row
         
+        # Committed together with the terminal status in _finalize_task
         task.status = "running"
-        self.session.add(task)
-        self.session.commit()
         
-        # Get guest's DigiLocker token
-        guest = self.session.get(Guest, guest_id)
-        if not guest or not guest.digilocker_token:
-            error_msg = f"Guest {guest_id} has no DigiLocker token"
-            task.status = "failed"
-            task.error = error_msg
-            task.completed_at = get_current_time()
-            self.session.add(task)
-            self.session.commit()
-            logger.error(error_msg)
-            raise UnauthorizedError(error_msg)
-        
-        # Check if token is expired
-        if guest.digilocker_token_expiry and guest.digilocker_token_expiry < get_current_time():
-            # Try to refresh token
-            if guest.digilocker_refresh_token:
-                try:
-                    token_data = await self.refresh_token(guest.digilocker_refresh_token)
-                    guest = await self.update_guest_tokens(guest_id, token_data)
-                except Exception as e:
-                    error_msg = f"Failed to refresh DigiLocker token: {str(e)}"
-                    task.status = "failed"
-                    task.error = error_msg
-                    task.completed_at = get_current_time()
-                    self.session.add(task)
-                    self.session.commit()
-                    logger.error(error_msg)
-                    raise UnauthorizedError(error_msg)
-            else:
-                error_msg = "DigiLocker token expired and no refresh token available"
-                task.status = "failed"
-                task.error = error_msg
-                task.completed_at = get_current_time()
-                self.session.add(task)
-                self.session.commit()
+        # Use the cached access token when it still has enough life left
+        access_token = await _get_cached_token(guest_id)
+        if access_token is None:
+            # Check the guest's DigiLocker token
+            if not guest or not guest.digilocker_token:
+                error_msg = f"Guest {guest_id} has no DigiLocker token"
+                self._finalize_task(task, "failed", error=error_msg)
                 logger.error(error_msg)
                 raise UnauthorizedError(error_msg)
+            
+            # Check if token is expired
+            now = get_current_time()
+            if guest.digilocker_token_expiry and guest.digilocker_token_expiry < now:
+                # Try to refresh token
+                if guest.digilocker_refresh_token:
+                    try:
+                        token_data = await self.refresh_token(guest.digilocker_refresh_token)
+                        guest = await self.update_guest_tokens(guest_id, token_data)
+                    except Exception as e:
+                        error_msg = f"Failed to refresh DigiLocker token: {str(e)}"
+                        self._finalize_task(task, "failed", error=error_msg)
+                        logger.error(error_msg)
+                        raise UnauthorizedError(error_msg)
+                else:
+                    error_msg = "DigiLocker token expired and no refresh token available"
+                    self._finalize_task(task, "failed", error=error_msg)
+                    logger.error(error_msg)
+                    raise UnauthorizedError(error_msg)
+            elif guest.digilocker_token_expiry:
+                # Refreshed tokens are cached by update_guest_tokens; cache the still-valid one here
+                ttl = (guest.digilocker_token_expiry - now).total_seconds()
+                await _cache_token(guest_id, guest.digilocker_token, ttl)
+            
+            access_token = guest.digilocker_token
         
         try:
-            # Fetch issued documents
-            issued_documents = await self._fetch_issued_documents(guest.digilocker_token)
-            
-            # Fetch uploaded documents
-            uploaded_documents = await self._fetch_uploaded_documents(guest.digilocker_token)
+            # Fetch issued and uploaded documents concurrently; the first failure propagates
+            issued_documents, uploaded_documents = await asyncio.gather(
+                self._fetch_issued_documents(access_token),
+                self._fetch_uploaded_documents(access_token)
+            )
             
             # Combine results
             result = {
@@ -195,42 +294,44 @@ class DigiLockerService:
             }
             
             # Update task with result
-            task.status = "completed"
-            task.result = str(result)
-            task.completed_at = get_current_time()
-            self.session.add(task)
-            self.session.commit()
+            self._finalize_task(task, "completed", result=orjson.dumps(result).decode())
             
             logger.info(f"DigiLocker document fetch completed for task: {task_id}")
             return result
             
         except Exception as e:
+            # Drop the cached token so the next attempt re-reads the guest
+            await _invalidate_cached_token(guest_id)
+            
             # Update task with error
-            task.status = "failed"
-            task.error = str(e)
-            task.completed_at = get_current_time()
-            self.session.add(task)
-            self.session.commit()
+            self._finalize_task(task, "failed", error=str(e))
             
             logger.error(f"DigiLocker document fetch failed for task: {task_id}. Error: {str(e)}")
             raise
     
+    def _finalize_task(self, task: BackgroundTask, status: str, error: Optional[str] = None, result: Optional[str] = None) -> None:
+        """Record a task's terminal status in a single commit"""
+        task.status = status
+        task.error = error
+        task.result = result
+        task.completed_at = get_current_time()
+        self.session.commit()
+    
     async def _fetch_issued_documents(self, access_token: str) -> List[Dict[str, Any]]:
         """Fetch issued documents from DigiLocker"""
         headers = {"Authorization": f"Bearer {access_token}"}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.issued_documents_url, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"DigiLocker issued documents fetch failed: {error_text}")
-                        raise ServerError("Failed to fetch issued documents")
-                    
-                    data = await response.json()
-                    documents = data.get("documents", [])
-                    logger.info(f"Fetched {len(documents)} issued documents from DigiLocker")
-                    return documents
+            async with self._request("GET", self.issued_documents_url, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await _read_error_text(response)
+                    logger.error(f"DigiLocker issued documents fetch failed: {error_text}")
+                    raise ServerError("Failed to fetch issued documents")
+                
+                data = await response.json(loads=orjson.loads)
+                documents = data.get("documents", [])
+                logger.info(f"Fetched {len(documents)} issued documents from DigiLocker")
+                return documents
         except aiohttp.ClientError as e:
             logger.error(f"DigiLocker API error: {str(e)}")
             raise ServerError(f"DigiLocker API error: {str(e)}")
@@ -240,17 +341,16 @@ class DigiLockerService:
         headers = {"Authorization": f"Bearer {access_token}"}
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(self.uploaded_documents_url, headers=headers) as response:
-                    if response.status != 200:
-                        error_text = await response.text()
-                        logger.error(f"DigiLocker uploaded documents fetch failed: {error_text}")
-                        raise ServerError("Failed to fetch uploaded documents")
-                    
-                    data = await response.json()
-                    documents = data.get("documents", [])
-                    logger.info(f"Fetched {len(documents)} uploaded documents from DigiLocker")
-                    return documents
+            async with self._request("GET", self.uploaded_documents_url, headers=headers) as response:
+                if response.status != 200:
+                    error_text = await _read_error_text(response)
+                    logger.error(f"DigiLocker uploaded documents fetch failed: {error_text}")
+                    raise ServerError("Failed to fetch uploaded documents")
+                
+                data = await response.json(loads=orjson.loads)
+                documents = data.get("documents", [])
+                logger.info(f"Fetched {len(documents)} uploaded documents from DigiLocker")
+                return documents
         except aiohttp.ClientError as e:
             logger.error(f"DigiLocker API error: {str(e)}")
             raise ServerError(f"DigiLocker API error: {str(e)}")
\ No newline at end of file
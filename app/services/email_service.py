@@ -1,10 +1,14 @@
 import os
+import re
+import time
+import asyncio
 import smtplib
 import ssl
+import base64
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from email.mime.application import MIMEApplication
-from typing import List, Optional, Dict, Any, Union
+from email.mime.base import MIMEBase
+from typing import List, Optional, Dict, Any, Union, Tuple
 from pathlib import Path
 from datetime import datetime
 
@@ -12,26 +16,71 @@ from app.config.config import settings
 from app.utils.helpers import get_current_time
 from loguru import logger
 
-class EmailService:
-    def __init__(self):
-        self.smtp_server = settings.SMTP_SERVER
-        self.smtp_port = settings.SMTP_PORT
-        self.smtp_username = settings.SMTP_USERNAME
-        self.smtp_password = settings.SMTP_PASSWORD
-        self.sender_email = settings.EMAIL_FROM
-        self.use_tls = True  # Default to TLS
-        self.templates_dir = "./email_templates"  # Default templates directory
-        
-        # Create templates directory if it doesn't exist
-        Path(self.templates_dir).mkdir(parents=True, exist_ok=True)
-        
-        # Create default templates if they don't exist
-        self._create_default_templates()
+# Matches {placeholder} names; CSS blocks such as "{ font-family: ... }" never match
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
+
+# Compiled templates: path -> (mtime, parts), where parts alternate literal text and placeholder names
+_TEMPLATE_CACHE: Dict[str, Tuple[float, List[str]]] = {}
+
+def _load_template(template_path: str) -> List[str]:
+    """Load and compile a template, reusing the cached copy until the file changes"""
+    mtime = os.path.getmtime(template_path)
+    cached = _TEMPLATE_CACHE.get(template_path)
+    if cached and cached[0] == mtime:
+        return cached[1]
     
-    def _create_default_templates(self):
-        """Create default email templates if they don't exist"""
-        templates = {
-            "booking_confirmation.html": """
+    with open(template_path, "r") as f:
+        parts = _PLACEHOLDER_RE.split(f.read())
+    _TEMPLATE_CACHE[template_path] = (mtime, parts)
+    return parts
+
+def _render_template(parts: List[str], template_data: Dict[str, Any]) -> str:
+    """Fill placeholders in a compiled template; unknown placeholders are left as-is"""
+    rendered = parts[:]
+    # Each value is converted once even when its placeholder repeats
+    values: Dict[str, str] = {}
+    for i in range(1, len(parts), 2):
+        key = parts[i]
+        value = values.get(key)
+        if value is None:
+            value = values[key] = str(template_data[key]) if key in template_data else "{" + key + "}"
+        rendered[i] = value
+    return "".join(rendered)
+
+# Pooled SMTP connections shared by all EmailService instances
+_SMTP_POOL_SIZE = 4
+# Idle connections older than this are checked with NOOP before reuse
+_SMTP_IDLE_CHECK_SECONDS = 60
+_SMTP_SLOTS = asyncio.Semaphore(_SMTP_POOL_SIZE)
+_SMTP_IDLE: List[Tuple[smtplib.SMTP, float]] = []
+
+# 57 raw bytes encode to one 76-character base64 line
+_ATTACHMENT_CHUNK_SIZE = 57 * 1024
+
+def _encode_attachment(attachment_path: str) -> MIMEBase:
+    """Build a base64 attachment part, encoding the file from disk in chunks"""
+    filename = os.path.basename(attachment_path)
+    with open(attachment_path, "rb") as f:
+        payload = "".join(
+            base64.encodebytes(chunk).decode("ascii")
+            for chunk in iter(lambda: f.read(_ATTACHMENT_CHUNK_SIZE), b"")
+        )
+    
+    part = MIMEBase("application", "octet-stream", name=filename)
+    part.set_payload(payload)
+    part["Content-Transfer-Encoding"] = "base64"
+    part["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return part
+
+def _close_smtp(server: smtplib.SMTP) -> None:
+    """Close an SMTP connection, ignoring errors from dead connections"""
+    try:
+        server.quit()
+    except Exception:
+        server.close()
+
+# Default templates written to the templates directory when missing
+_BOOKING_CONFIRMATION_TEMPLATE = b"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -75,9 +124,9 @@ class EmailService:
                 </div>
             </body>
             </html>
-            """,
-            
-            "invoice.html": """
+            """
+
+_INVOICE_TEMPLATE = b"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -141,9 +190,9 @@ class EmailService:
                 </div>
             </body>
             </html>
-            """,
-            
-            "password_reset.html": """
+            """
+
+_PASSWORD_RESET_TEMPLATE = b"""
             <!DOCTYPE html>
             <html>
             <head>
@@ -186,13 +235,38 @@ class EmailService:
             </body>
             </html>
             """
-        }
+
+_DEFAULT_TEMPLATES = (
+    ("booking_confirmation.html", _BOOKING_CONFIRMATION_TEMPLATE),
+    ("invoice.html", _INVOICE_TEMPLATE),
+    ("password_reset.html", _PASSWORD_RESET_TEMPLATE),
+)
+
+class EmailService:
+    # Set once the default templates have been written by the first instance
+    _templates_initialized: bool = False
+    
+    def __init__(self):
+        self.smtp_server = settings.SMTP_SERVER
+        self.smtp_port = settings.SMTP_PORT
+        self.smtp_username = settings.SMTP_USERNAME
+        self.smtp_password = settings.SMTP_PASSWORD
+        self.sender_email = settings.EMAIL_FROM
+        self.use_tls = True  # Default to TLS
+        self.templates_dir = "./email_templates"  # Default templates directory
         
-        for filename, content in templates.items():
-            file_path = os.path.join(self.templates_dir, filename)
-            if not os.path.exists(file_path):
-                with open(file_path, "w") as f:
-                    f.write(content)
+        # Create the templates directory and default templates once per process
+        if not EmailService._templates_initialized:
+            Path(self.templates_dir).mkdir(parents=True, exist_ok=True)
+            self._create_default_templates()
+            EmailService._templates_initialized = True
+    
+    def _create_default_templates(self):
+        """Create default email templates if they don't exist"""
+        for filename, content in _DEFAULT_TEMPLATES:
+            file_path = Path(self.templates_dir) / filename
+            if not file_path.exists():
+                file_path.write_bytes(content)
                 logger.info(f"Created default email template: {filename}")
     
     async def send_email(self, 
@@ -215,9 +289,10 @@ class EmailService:
             bcc = [bcc]
         
         # Create message
+        to_joined = ", ".join(to_email)
         message = MIMEMultipart()
         message["From"] = self.sender_email
-        message["To"] = ", ".join(to_email)
+        message["To"] = to_joined
         message["Subject"] = subject
         
         if cc:
@@ -236,41 +311,84 @@ class EmailService:
         if attachments:
             for attachment_path in attachments:
                 if os.path.exists(attachment_path):
-                    with open(attachment_path, "rb") as file:
-                        part = MIMEApplication(file.read(), Name=os.path.basename(attachment_path))
-                    
-                    part["Content-Disposition"] = f'attachment; filename="{os.path.basename(attachment_path)}"'
+                    part = await asyncio.to_thread(_encode_attachment, attachment_path)
                     message.attach(part)
                 else:
                     logger.warning(f"Attachment not found: {attachment_path}")
         
         try:
-            # Create secure connection and send email
-            context = ssl.create_default_context()
+            # Combine all recipients into a new list so the caller's list is untouched
+            all_recipients = [*to_email, *(cc or []), *(bcc or [])]
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                if self.use_tls:
-                    server.starttls(context=context)
-                
-                if self.smtp_username and self.smtp_password:
-                    server.login(self.smtp_username, self.smtp_password)
-                
-                # Combine all recipients
-                all_recipients = to_email
-                if cc:
-                    all_recipients.extend(cc)
-                if bcc:
-                    all_recipients.extend(bcc)
-                
-                server.sendmail(self.sender_email, all_recipients, message.as_string())
+            # Send over a pooled connection
+            await self._send_pooled(message, all_recipients)
             
-            logger.info(f"Email sent successfully to {', '.join(to_email)}")
+            logger.info(f"Email sent successfully to {to_joined}")
             return True
             
         except Exception as e:
             logger.error(f"Failed to send email: {str(e)}")
             return False
     
+    async def _send_pooled(self, message: MIMEMultipart, all_recipients: List[str]) -> None:
+        """Send a message over a pooled SMTP connection"""
+        async with _SMTP_SLOTS:
+            idle = _SMTP_IDLE.pop() if _SMTP_IDLE else None
+            
+            # Run the blocking SMTP exchange in a worker thread
+            server = await asyncio.to_thread(self._send_sync, idle, message, all_recipients)
+            _SMTP_IDLE.append((server, time.monotonic()))
+    
+    def _connect_sync(self) -> smtplib.SMTP:
+        """Open an authenticated SMTP connection (blocking)"""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port)
+        try:
+            if self.use_tls:
+                server.starttls(context=ssl.create_default_context())
+            
+            if self.smtp_username and self.smtp_password:
+                server.login(self.smtp_username, self.smtp_password)
+        except Exception:
+            _close_smtp(server)
+            raise
+        return server
+    
+    def _send_sync(self, idle: Optional[Tuple[smtplib.SMTP, float]], message: MIMEMultipart, all_recipients: List[str]) -> smtplib.SMTP:
+        """Send a message, reusing an idle connection when it is still alive (blocking)"""
+        server = None
+        if idle:
+            server, last_used = idle
+            if time.monotonic() - last_used > _SMTP_IDLE_CHECK_SECONDS:
+                try:
+                    if server.noop()[0] != 250:
+                        raise smtplib.SMTPServerDisconnected("NOOP failed")
+                except smtplib.SMTPException:
+                    _close_smtp(server)
+                    server = None
+        
+        if server is None:
+            server = self._connect_sync()
+        
+        try:
+            try:
+                server.send_message(message, from_addr=self.sender_email, to_addrs=all_recipients)
+            except smtplib.SMTPServerDisconnected:
+                # Server dropped the pooled connection; reconnect once
+                _close_smtp(server)
+                server = self._connect_sync()
+                server.send_message(message, from_addr=self.sender_email, to_addrs=all_recipients)
+        except Exception:
+            _close_smtp(server)
+            raise
+        return server
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Close all idle pooled SMTP connections"""
+        while _SMTP_IDLE:
+            server, _ = _SMTP_IDLE.pop()
+            await asyncio.to_thread(_close_smtp, server)
+    
     async def send_template_email(self, 
                                  template_name: str, 
                                  to_email: Union[str, List[str]], 
@@ -282,23 +400,20 @@ class EmailService:
         """Send an email using a template"""
         template_path = os.path.join(self.templates_dir, template_name)
         
-        if not os.path.exists(template_path):
-            logger.error(f"Email template not found: {template_name}")
-            return False
-        
         try:
-            # Read template
-            with open(template_path, "r") as f:
-                template_content = f.read()
+            # Get compiled template
+            try:
+                template_parts = await asyncio.to_thread(_load_template, template_path)
+            except FileNotFoundError:
+                logger.error(f"Email template not found: {template_name}")
+                return False
             
             # Add current year to template data
             if "current_year" not in template_data:
                 template_data["current_year"] = str(datetime.now().year)
             
-            # Replace placeholders
-            for key, value in template_data.items():
-                placeholder = "{" + key + "}"
-                template_content = template_content.replace(placeholder, str(value))
+            # Replace placeholders in a single pass
+            template_content = _render_template(template_parts, template_data)
             
             # Send email
             return await self.send_email(
@@ -1,8 +1,8 @@
-from typing import List, Optional, Dict, Any, Union
+from typing import List, Optional, Dict, Any, Set, Union
 from sqlmodel import Session, select, or_
+from sqlalchemy import func, insert
 from fastapi import UploadFile
-import csv
-import io
+import pandas as pd
 
 from app.models.models import Guest
 from app.schemas.schemas import GuestCreate, GuestUpdate
@@ -10,6 +10,13 @@ from app.utils.errors import NotFoundError, ConflictError
 from app.utils.helpers import get_current_time
 from loguru import logger
 
+# Rows per multi-row INSERT when importing guests
+IMPORT_BATCH_SIZE = 1000
+# Columns read from guest CSV imports; any others are ignored
+GUEST_CSV_COLUMNS = ('name', 'email', 'phone', 'id_type', 'id_number', 'notes', 'is_premium')
+# Lower-cased is_premium values that count as true
+TRUTHY_VALUES = frozenset({'true', 'yes', '1'})
+
 class GuestService:
     def __init__(self, session: Session):
         self.session = session
@@ -17,15 +24,16 @@ class GuestService:
     async def create_guest(self, guest_data: GuestCreate) -> Guest:
         """Create a new guest"""
         # Check if guest with same email or phone already exists
-        if guest_data.email or guest_data.phone:
-            query = select(Guest).where(
-                or_(
-                    Guest.email == guest_data.email if guest_data.email else False,
-                    Guest.phone == guest_data.phone if guest_data.phone else False
-                )
-            )
-            existing_guest = self.session.exec(query).first()
-            if existing_guest:
+        conditions = []
+        if guest_data.email:
+            conditions.append(Guest.email == guest_data.email)
+        if guest_data.phone:
+            conditions.append(Guest.phone == guest_data.phone)
+        if conditions:
+            # Only the id is needed to detect a duplicate
+            query = select(Guest.id).where(or_(*conditions)).limit(1)
+            existing_guest_id = self.session.exec(query).first()
+            if existing_guest_id is not None:
                 logger.warning(f"Attempted to create duplicate guest: {guest_data.dict()}")
                 raise ConflictError("Guest with this email or phone already exists")
         
@@ -44,7 +52,6 @@ class GuestService:
         
         self.session.add(guest)
         self.session.commit()
-        self.session.refresh(guest)
         
         logger.info(f"Created new guest: {guest.id} - {guest.name}")
         return guest
@@ -57,20 +64,22 @@ class GuestService:
             raise NotFoundError(f"Guest with ID {guest_id} not found")
         return guest
     
+    def _apply_search(self, query, search: Optional[str]):
+        """Apply the guest search filter if provided"""
+        if not search:
+            return query
+        return query.where(
+            or_(
+                Guest.name.contains(search),
+                Guest.email.contains(search),
+                Guest.phone.contains(search),
+                Guest.id_number.contains(search)
+            )
+        )
+    
     async def get_guests(self, skip: int = 0, limit: int = 100, search: Optional[str] = None) -> List[Guest]:
         """Get list of guests with optional search"""
-        query = select(Guest)
-        
-        # Apply search filter if provided
-        if search:
-            query = query.where(
-                or_(
-                    Guest.name.contains(search),
-                    Guest.email.contains(search),
-                    Guest.phone.contains(search),
-                    Guest.id_number.contains(search)
-                )
-            )
+        query = self._apply_search(select(Guest), search)
         
         # Apply pagination
         query = query.offset(skip).limit(limit)
@@ -80,20 +89,8 @@ class GuestService:
     
     async def count_guests(self, search: Optional[str] = None) -> int:
         """Count total guests with optional search"""
-        query = select(Guest)
-        
-        # Apply search filter if provided
-        if search:
-            query = query.where(
-                or_(
-                    Guest.name.contains(search),
-                    Guest.email.contains(search),
-                    Guest.phone.contains(search),
-                    Guest.id_number.contains(search)
-                )
-            )
-        
-        return len(self.session.exec(query).all())
+        query = self._apply_search(select(func.count()).select_from(Guest), search)
+        return self.session.exec(query).one()
     
     async def update_guest(self, guest_id: int, guest_data: GuestUpdate) -> Guest:
         """Update guest information"""
@@ -113,7 +110,6 @@ class GuestService:
         
         self.session.add(guest)
         self.session.commit()
-        self.session.refresh(guest)
         
         logger.info(f"Updated guest: {guest.id} - {guest.name}")
         return guest
@@ -138,61 +134,90 @@ class GuestService:
         
         self.session.add(guest)
         self.session.commit()
-        self.session.refresh(guest)
         
         logger.info(f"Updated DigiLocker tokens for guest: {guest_id}")
         return guest
     
     async def import_guests_from_csv(self, file: UploadFile) -> Dict[str, Any]:
         """Import guests from CSV file"""
-        # Read CSV file
-        contents = await file.read()
-        csv_data = contents.decode('utf-8')
-        csv_reader = csv.DictReader(io.StringIO(csv_data))
+        # Parse the uploaded file in chunks with pandas' C parser; every column is read as text
+        try:
+            chunks = pd.read_csv(
+                file.file,
+                chunksize=IMPORT_BATCH_SIZE,
+                dtype=str,
+                keep_default_na=False,
+                usecols=lambda column: column in GUEST_CSV_COLUMNS,
+                encoding='utf-8'
+            )
+        except pd.errors.EmptyDataError:
+            chunks = []
         
         # Process CSV rows
         total_rows = 0
         imported = 0
         skipped = 0
         errors = []
-        
-        for row in csv_reader:
-            total_rows += 1
-            try:
-                # Check if guest already exists
-                query = select(Guest).where(
-                    or_(
-                        Guest.email == row.get('email') if row.get('email') else False,
-                        Guest.phone == row.get('phone') if row.get('phone') else False
-                    )
-                )
-                existing_guest = self.session.exec(query).first()
-                
-                if existing_guest:
-                    skipped += 1
-                    continue
-                
-                # Create guest from CSV data
-                guest = Guest(
-                    name=row.get('name', ''),
-                    phone=row.get('phone'),
-                    email=row.get('email'),
-                    id_type=row.get('id_type'),
-                    id_number=row.get('id_number'),
-                    notes=row.get('notes'),
-                    is_premium=row.get('is_premium', '').lower() in ['true', 'yes', '1'],
-                    first_seen=get_current_time(),
-                    created_at=get_current_time()
-                )
-                
-                self.session.add(guest)
-                imported += 1
-                
-            except Exception as e:
-                errors.append(f"Row {total_rows}: {str(e)}")
-        
-        # Commit all changes
-        self.session.commit()
+        existing_emails: Set[str] = set()
+        existing_phones: Set[str] = set()
+        now = get_current_time()
+        
+        try:
+            # The whole import is one transaction; nothing is pending in the ORM, so skip autoflush
+            with self.session.no_autoflush:
+                for chunk in chunks:
+                    if 'is_premium' in chunk:
+                        is_premium = chunk['is_premium'].str.lower().isin(TRUTHY_VALUES).tolist()
+                    else:
+                        is_premium = [False] * len(chunk)
+                    # Short rows leave NaN cells; treat them as missing values
+                    rows = chunk.astype(object).where(chunk.notna(), None).to_dict('records')
+                    
+                    # Look up the batch's emails and phones up front instead of once per row
+                    existing_emails |= self._existing_values(Guest.email, {row['email'] for row in rows if row.get('email')} - existing_emails)
+                    existing_phones |= self._existing_values(Guest.phone, {row['phone'] for row in rows if row.get('phone')} - existing_phones)
+                    
+                    to_insert = []
+                    for row, premium in zip(rows, is_premium):
+                        total_rows += 1
+                        try:
+                            # Check if guest already exists, including earlier rows of this file
+                            email = row.get('email')
+                            phone = row.get('phone')
+                            if (email and email in existing_emails) or (phone and phone in existing_phones):
+                                skipped += 1
+                                continue
+                            
+                            # Build the guest row for a multi-row INSERT
+                            to_insert.append({
+                                "name": row.get('name') or '',
+                                "phone": phone,
+                                "email": email,
+                                "id_type": row.get('id_type'),
+                                "id_number": row.get('id_number'),
+                                "notes": row.get('notes'),
+                                "is_premium": premium,
+                                "first_seen": now,
+                                "created_at": now
+                            })
+                            imported += 1
+                            if email:
+                                existing_emails.add(email)
+                            if phone:
+                                existing_phones.add(phone)
+                            
+                        except Exception as e:
+                            errors.append(f"Row {total_rows}: {str(e)}")
+                    
+                    if to_insert:
+                        self.session.exec(insert(Guest), params=to_insert)
+            
+            # Commit all changes
+            self.session.commit()
+        except Exception:
+            # Don't leave half an import behind for the next commit on this session
+            self.session.rollback()
+            raise
         
         logger.info(f"Imported {imported} guests from CSV, skipped {skipped}, errors: {len(errors)}")
         
@@ -201,4 +226,14 @@ class GuestService:
             "imported": imported,
             "skipped": skipped,
             "errors": errors
-        }
\ No newline at end of file
+        }
+    
+    def _existing_values(self, column, values: Set[str]) -> Set[str]:
+        """Return the subset of values already stored in a guest column"""
+        values = list(values)
+        existing = set()
+        # Chunk the IN list to stay under database bind-parameter limits
+        for i in range(0, len(values), 500):
+            query = select(column).where(column.in_(values[i:i + 500]))
+            existing.update(self.session.exec(query).all())
+        return existing
@@ -1,19 +1,83 @@
 import os
 import re
-import uuid
+import asyncio
+import orjson
 import pytesseract
 import numpy as np
+from itertools import chain
 from typing import Dict, Any, Optional, List, Tuple
 from fastapi import UploadFile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from PIL import Image, ImageEnhance, ImageFilter
 
 from app.models.models import BackgroundTask
-from app.utils.helpers import get_current_time, save_upload_file, generate_unique_filename
+from app.utils.helpers import get_current_time, save_upload_file, generate_unique_filename, generate_task_id
 from app.config.config import settings
 from loguru import logger
 
+# All field patterns in one alternation scanned once by _extract_fields. Each
+# alternative is a lookahead so a long match (e.g. a name line) never hides
+# another field that starts inside it.
+_FIELDS_RE = re.compile(
+    r'(?=(?:Name|NAME)\s*[:-]\s*(?P<name>[^\n]+))'
+    r'|(?=(?:ID|ID Number|ID No|ID NO)\s*[:-]\s*(?P<id>[A-Z0-9]+))'
+    r'|(?=(?:Passport|PASSPORT)\s*[:-]\s*(?P<passport>[A-Z0-9]+))'
+    r'|(?=(?:Aadhar|AADHAR|Aadhaar|AADHAAR)\s*[:-]\s*(?P<aadhaar>[0-9]{12}))'
+    r'|(?=(?:DL|Driving License|DRIVING LICENSE)\s*[:-]\s*(?P<driving_license>[A-Z0-9]+))'
+    r'|(?=(?:Date|DATE|DOB|Date of Birth)\s*[:-]\s*(?P<labelled_date>[0-9]{1,2}[/\-][0-9]{1,2}[/\-][0-9]{2,4}))'
+    r'|(?=(?P<date>[0-9]{1,2}[/\-][0-9]{1,2}[/\-][0-9]{2,4}))'
+)
+# When several match, the first group listed wins
+_ID_GROUPS = ("id", "passport", "aadhaar", "driving_license")
+_DATE_GROUPS = ("labelled_date", "date")
+
+def _has_text(words: List[str]) -> np.ndarray:
+    """Mask of OCR words that are not empty or whitespace-only"""
+    return np.char.str_len(np.char.strip(np.asarray(words, dtype=str))) > 0
+
+def _otsu_threshold(gray: np.ndarray) -> int:
+    """Pick the grayscale threshold that maximises between-class variance (Otsu)"""
+    hist = np.bincount(gray.ravel(), minlength=256).astype(np.float64)
+    weight_bg = np.cumsum(hist)
+    weight_fg = weight_bg[-1] - weight_bg
+    sum_bg = np.cumsum(hist * np.arange(256))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_bg = sum_bg / weight_bg
+        mean_fg = (sum_bg[-1] - sum_bg) / weight_fg
+        between = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+    # Uniform images have no valid split; fall back to the first bin
+    return int(np.argmax(np.nan_to_num(between)))
+
+def _init_ocr_worker(tesseract_cmd: Optional[str]) -> None:
+    """Configure an OCR worker process once, so each call only runs tesseract itself"""
+    if tesseract_cmd:
+        pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+    try:
+        # Cached by pytesseract for the life of the worker
+        pytesseract.get_tesseract_version()
+    except Exception:
+        # A missing binary is reported by the first OCR call instead of breaking the pool
+        pass
+
+def _run_tesseract(image: np.ndarray, lang: str, config: str) -> Dict[str, Any]:
+    """Run tesseract on a preprocessed image; module-level so worker processes can unpickle it"""
+    try:
+        return pytesseract.image_to_data(
+            image,
+            lang=lang,
+            output_type=pytesseract.Output.DICT,
+            config=config
+        )
+    except Exception as e:
+        # pytesseract's exceptions can't be unpickled in the parent, which would break the pool
+        raise RuntimeError(f"{type(e).__name__}: {e}") from None
+
 class OCRService:
+    # Shared across instances so worker processes are started once
+    _pool: Optional[ProcessPoolExecutor] = None
+    
     def __init__(self, session=None):
         self.session = session
         self.upload_dir = Path(settings.OCR_UPLOAD_DIR)
@@ -23,10 +87,42 @@ class OCRService:
         # Ensure upload directory exists
         self.upload_dir.mkdir(parents=True, exist_ok=True)
         
+        # LSTM-only engine skips loading the legacy recognizer
+        self.tesseract_config = f"--oem 1 --psm {settings.OCR_PSM}"
+        
         # Configure pytesseract
         if self.tesseract_cmd:
             pytesseract.pytesseract.tesseract_cmd = self.tesseract_cmd
     
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        """Get the shared OCR worker pool, creating it on first use"""
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(
+                max_workers=settings.OCR_WORKERS,
+                initializer=_init_ocr_worker,
+                initargs=(settings.TESSERACT_CMD,)
+            )
+        return cls._pool
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Shut down the shared OCR worker pool"""
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+        cls._pool = None
+    
+    async def _run_tesseract(self, image: np.ndarray, lang: str) -> Dict[str, Any]:
+        """Run tesseract in the shared worker pool"""
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._get_pool(), _run_tesseract, image, lang, self.tesseract_config
+            )
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool on the next call
+            type(self)._pool = None
+            raise
+    
     async def save_document(self, file: UploadFile) -> Tuple[str, Path]:
         """Save uploaded document to disk"""
         # Validate file type
@@ -46,13 +142,13 @@ class OCRService:
     
     async def create_ocr_task(self, filename: str, lang: str = None) -> BackgroundTask:
         """Create a background task for OCR processing"""
-        task_id = str(uuid.uuid4())
+        task_id = generate_task_id()
         
         task = BackgroundTask(
             task_id=task_id,
             task_type="ocr",
             status="pending",
-            result=f"{{\"filename\": \"{filename}\", \"lang\": \"{lang or self.default_lang}\"}}",
+            result=orjson.dumps({"filename": filename, "lang": lang or self.default_lang}).decode(),
             created_at=get_current_time()
         )
         
@@ -81,43 +177,12 @@ class OCRService:
             # Process image with OCR
             logger.info(f"Starting OCR processing for file: {filename} with language: {lang}")
             
-            # Preprocess image
-            preprocessed_image = self._preprocess_image(file_path)
-            
-            # Perform OCR
-            ocr_result = pytesseract.image_to_data(
-                preprocessed_image, 
-                lang=lang,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Extract text and confidence
-            text = self._extract_text_from_result(ocr_result)
-            confidence = self._calculate_confidence(ocr_result)
-            
-            # Extract structured fields
-            fields = self._extract_fields(text)
-            
-            # Prepare result
-            result = {
-                "text": text,
-                "confidence": confidence,
-                "fields": fields,
-                "raw_data": {
-                    "words": ocr_result["text"],
-                    "confidences": ocr_result["conf"],
-                    "word_boxes": [
-                        (ocr_result["left"][i], ocr_result["top"][i], 
-                         ocr_result["width"][i], ocr_result["height"][i])
-                        for i in range(len(ocr_result["text"]))
-                        if ocr_result["text"][i].strip()
-                    ]
-                }
-            }
+            result = await self._run_ocr_pipeline(file_path, lang)
             
             # Update task with result
             task.status = "completed"
-            task.result = str(result)
+            # Keep the task row compact; the per-word raw data is only returned to the caller
+            task.result = orjson.dumps({key: result[key] for key in ("text", "confidence", "fields")}).decode()
             task.completed_at = get_current_time()
             self.session.add(task)
             self.session.commit()
@@ -143,42 +208,75 @@ class OCRService:
             except Exception as e:
                 logger.warning(f"Failed to clean up temporary files: {str(e)}")
     
-    def _preprocess_image(self, image_path: Path) -> np.ndarray:
-        """Preprocess image for better OCR results"""
-        # Read image with PIL
-        img = Image.open(str(image_path))
+    async def _run_ocr_pipeline(self, image_path: Path, lang: str) -> Dict[str, Any]:
+        """Preprocess an image, run OCR on it and extract text, confidence and fields"""
+        # Preprocess image
+        preprocessed_image = await asyncio.to_thread(self._preprocess_image, image_path)
         
-        # Convert to grayscale
-        gray = img.convert('L')
+        # Perform OCR in the worker pool; tesseract is CPU-bound and synchronous
+        ocr_result = await self._run_tesseract(preprocessed_image, lang)
         
-        # Enhance contrast
-        enhancer = ImageEnhance.Contrast(gray)
-        enhanced_img = enhancer.enhance(2.0)
+        # Extract text and confidence
+        text = self._extract_text_from_result(ocr_result)
+        confidence = self._calculate_confidence(ocr_result)
+        
+        # Extract structured fields
+        fields = self._extract_fields(text)
         
-        # Sharpen image
-        enhancer = ImageEnhance.Sharpness(enhanced_img)
+        return {
+            "text": text,
+            "confidence": confidence,
+            "fields": fields,
+            "raw_data": {
+                "words": ocr_result["text"],
+                "confidences": ocr_result["conf"],
+                "word_boxes": self._pack_boxes(ocr_result)
+            }
+        }
+    
+    def _preprocess_image(self, image_path: Path) -> np.ndarray:
+        """Preprocess image for better OCR results"""
+        # Read image with PIL, decoding once straight to grayscale (libjpeg does this
+        # natively for JPEGs via draft mode; other formats are converted after decode)
+        with Image.open(image_path) as img:
+            img.draft('L', img.size)
+            gray = img.convert('L')
+        
+        # Sharpen image; Otsu thresholding below adapts to contrast, so no contrast boost is needed
+        enhancer = ImageEnhance.Sharpness(gray)
         enhanced_img = enhancer.enhance(2.0)
         
-        # Apply threshold to get black and white image
-        enhanced_array = np.array(enhanced_img)
-        binary = np.where(enhanced_array > 150, 255, 0)
+        # Apply Otsu threshold to get black and white image
+        enhanced_array = np.asarray(enhanced_img)
+        # uint8 mask (1 byte per pixel) rather than the int64 array np.where would build
+        binary = (enhanced_array > _otsu_threshold(enhanced_array)).astype(np.uint8)
+        binary *= 255
         
         return binary
     
     def _extract_text_from_result(self, ocr_result: Dict[str, Any]) -> str:
         """Extract text from OCR result"""
-        text = ""
-        for i in range(len(ocr_result["text"])):
-            word = ocr_result["text"][i]
-            if word.strip():
-                # Add space between words
-                if i > 0 and ocr_result["text"][i-1].strip() and ocr_result["line_num"][i] == ocr_result["line_num"][i-1]:
-                    text += " "
-                # Add newline between lines
-                elif i > 0 and ocr_result["line_num"][i] != ocr_result["line_num"][i-1]:
-                    text += "\n"
-                text += word
-        return text
+        words = ocr_result["text"]
+        if not words:
+            return ""
+        
+        has_text = _has_text(words)
+        lines = np.asarray(ocr_result["line_num"])
+        new_line = np.zeros(len(words), dtype=bool)
+        new_line[1:] = lines[1:] != lines[:-1]
+        
+        # Space after a word on the same line, newline at a line change, nothing otherwise
+        after_word = np.zeros(len(words), dtype=bool)
+        after_word[1:] = has_text[:-1] & ~new_line[1:]
+        separators = np.where(after_word, " ", np.where(new_line, "\n", ""))
+        
+        keep = np.flatnonzero(has_text)
+        return "".join(chain.from_iterable(zip(separators[keep].tolist(), (words[i] for i in keep))))
+    
+    def _pack_boxes(self, ocr_result: Dict[str, Any]) -> List[List[int]]:
+        """Get (left, top, width, height) boxes of the words that contain text"""
+        boxes = np.column_stack([np.asarray(ocr_result[key]) for key in ("left", "top", "width", "height")])
+        return boxes[_has_text(ocr_result["text"])].tolist()
     
     def _calculate_confidence(self, ocr_result: Dict[str, Any]) -> float:
         """Calculate overall confidence score"""
@@ -189,35 +287,25 @@ class OCRService:
         """Extract structured fields from OCR text"""
         fields = {}
         
+        # First occurrence of each pattern, from a single scan of the text
+        found: Dict[str, str] = {}
+        for match in _FIELDS_RE.finditer(text):
+            found.setdefault(match.lastgroup, match.group(match.lastgroup))
+        
         # Extract name (assuming format like "Name: John Doe" or "NAME: JOHN DOE")
-        name_match = re.search(r'(?:Name|NAME)\s*[:-]\s*([^\n]+)', text)
-        if name_match:
-            fields["name"] = name_match.group(1).strip()
+        if "name" in found:
+            fields["name"] = found["name"].strip()
         
         # Extract ID number (assuming format like "ID: 123456789" or various ID formats)
-        id_patterns = [
-            r'(?:ID|ID Number|ID No|ID NO)\s*[:-]\s*([A-Z0-9]+)',
-            r'(?:Passport|PASSPORT)\s*[:-]\s*([A-Z0-9]+)',
-            r'(?:Aadhar|AADHAR|Aadhaar|AADHAAR)\s*[:-]\s*([0-9]{12})',
-            r'(?:DL|Driving License|DRIVING LICENSE)\s*[:-]\s*([A-Z0-9]+)'
-        ]
-        
-        for pattern in id_patterns:
-            id_match = re.search(pattern, text)
-            if id_match:
-                fields["id_number"] = id_match.group(1).strip()
+        for group in _ID_GROUPS:
+            if group in found:
+                fields["id_number"] = found[group].strip()
                 break
         
         # Extract date (assuming format like "Date: DD/MM/YYYY" or "DOB: DD-MM-YYYY")
-        date_patterns = [
-            r'(?:Date|DATE|DOB|Date of Birth)\s*[:-]\s*([0-9]{1,2}[/\-][0-9]{1,2}[/\-][0-9]{2,4})',
-            r'([0-9]{1,2}[/\-][0-9]{1,2}[/\-][0-9]{2,4})'
-        ]
-        
-        for pattern in date_patterns:
-            date_match = re.search(pattern, text)
-            if date_match:
-                fields["date"] = date_match.group(1).strip()
+        for group in _DATE_GROUPS:
+            if group in found:
+                fields["date"] = found[group].strip()
                 break
         
         return fields
@@ -228,39 +316,7 @@ class OCRService:
             # Process image with OCR
             logger.info(f"Starting OCR processing for document: {document_path}")
             
-            # Preprocess image
-            preprocessed_image = self._preprocess_image(Path(document_path))
-            
-            # Perform OCR
-            ocr_result = pytesseract.image_to_data(
-                preprocessed_image, 
-                lang=self.default_lang,
-                output_type=pytesseract.Output.DICT
-            )
-            
-            # Extract text and confidence
-            text = self._extract_text_from_result(ocr_result)
-            confidence = self._calculate_confidence(ocr_result)
-            
-            # Extract structured fields
-            fields = self._extract_fields(text)
-            
-            # Prepare result
-            result = {
-                "text": text,
-                "confidence": confidence,
-                "fields": fields,
-                "raw_data": {
-                    "words": ocr_result["text"],
-                    "confidences": ocr_result["conf"],
-                    "word_boxes": [
-                        (ocr_result["left"][i], ocr_result["top"][i], 
-                         ocr_result["width"][i], ocr_result["height"][i])
-                        for i in range(len(ocr_result["text"]))
-                        if ocr_result["text"][i].strip()
-                    ]
-                }
-            }
+            result = await self._run_ocr_pipeline(Path(document_path), self.default_lang)
             
             logger.info(f"OCR processing completed for document: {document_path}")
             return result
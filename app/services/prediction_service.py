@@ -1,10 +1,16 @@
 import os
-import uuid
+import time
+import pickle
+import asyncio
 import numpy as np
 import pandas as pd
 import joblib
+import orjson
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime, timedelta
+from itertools import chain
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
@@ -12,12 +18,93 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
 
 from sqlmodel import Session, select
+from sqlalchemy import case, func
 from app.models.models import PredictionDataPoint, BackgroundTask, Room, Booking
-from app.utils.helpers import get_current_time, is_weekend
+from app.utils.helpers import get_current_time, is_weekend, generate_task_id
 from app.config.config import settings
 from loguru import logger
 
+# Forecasts up to this many days are served from a cached weekday/month table
+LOOKUP_MAX_DAYS = 14
+
+# Months with seasonal demand in the heuristic forecast
+PEAK_MONTHS = [6, 7, 8, 12]
+
+# How long the historical baseline for heuristic forecasts is reused
+BASELINE_CACHE_SECONDS = 300
+
+# Rows fetched per round-trip when streaming training data
+TRAINING_FETCH_SIZE = 1024
+
+DAY_NAMES = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+def heuristic_rates(weekdays: np.ndarray, months: np.ndarray, baseline_rate: float) -> np.ndarray:
+    """Apply weekend and peak-season factors to a baseline occupancy rate"""
+    # Weekend adjustment: higher occupancy on weekends
+    weekend_factor = np.where(weekdays >= 5, 1.2, 1.0)
+    
+    # Month adjustment: higher in peak seasons (adjust as needed)
+    month_factor = np.where(np.isin(months, PEAK_MONTHS), 1.1, 1.0)
+    
+    # Ensure rates are within valid range [0, 1]
+    return np.clip(baseline_rate * weekend_factor * month_factor, 0.0, 1.0)
+
+def _fit_occupancy_model(X: np.ndarray, y: np.ndarray, model_path: str, scaler_path: str) -> Dict[str, Any]:
+    """Fit, evaluate and save the occupancy model; module-level so the training worker can unpickle it"""
+    # Split data into training and validation sets
+    X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
+    
+    # Scale features; the scaler is kept for its statistics, applied the same way prediction applies them
+    scaler = StandardScaler().fit(X_train)
+    # Contiguous float32 is what the tree builder works on, so fit and predict skip their internal copy
+    X_train_scaled = ((X_train - scaler.mean_) / scaler.scale_).astype(np.float32)
+    X_val_scaled = ((X_val - scaler.mean_) / scaler.scale_).astype(np.float32)
+    
+    # Train model; a few shallow trees on 70% bootstrap samples are enough for five features
+    model = RandomForestRegressor(n_estimators=50, max_depth=6, max_samples=0.7, max_features="sqrt", n_jobs=-1, random_state=42)
+    model.fit(X_train_scaled, y_train)
+    
+    # Trees are built in parallel; keep prediction on small batches single-threaded
+    model.n_jobs = 1
+    
+    # Evaluate model
+    y_pred = model.predict(X_val_scaled)
+    mae = mean_absolute_error(y_val, y_pred)
+    rmse = np.sqrt(mean_squared_error(y_val, y_pred))
+    r2 = r2_score(y_val, y_pred)
+    
+    # Save model and scaler
+    joblib.dump(model, model_path, compress=3, protocol=pickle.HIGHEST_PROTOCOL)
+    joblib.dump(scaler, scaler_path, protocol=pickle.HIGHEST_PROTOCOL)
+    
+    # Get feature importance
+    feature_names = ['day_of_week', 'month', 'is_weekend', 'avg_stay_duration', 'avg_room_rate']
+    feature_importance = {name: float(importance) for name, importance in zip(feature_names, model.feature_importances_)}
+    
+    return {
+        "algorithm": "RandomForestRegressor",
+        "features": feature_names,
+        "target": "occupancy_rate",
+        "metrics": {
+            "mae": float(mae),
+            "rmse": float(rmse),
+            "r2": float(r2)
+        },
+        "feature_importance": feature_importance,
+        "training_samples": len(X_train),
+        "validation_samples": len(X_val)
+    }
+
 class PredictionService:
+    # (model mtime, scaler mtime, model, scaler) shared by all requests in this process
+    _model_cache: Optional[Tuple[float, float, Any, Any]] = None
+    # (model, avg stay, avg rate, 7x12 predictions) for short forecasts
+    _table_cache: Optional[Tuple[Any, float, float, np.ndarray]] = None
+    # (time.monotonic() expiry, average historical occupancy rate)
+    _baseline_cache: Optional[Tuple[float, float]] = None
+    # Single worker process for model training; the forest itself fits on all cores
+    _pool: Optional[ProcessPoolExecutor] = None
+    
     def __init__(self, session=None):
         self.session = session
         self.model_dir = Path(settings.ML_MODEL_DIR)
@@ -70,13 +157,12 @@ class PredictionService:
     
     async def _get_current_occupancy(self) -> Tuple[int, int]:
         """Get current occupancy statistics"""
-        # Count total rooms
-        total_rooms_query = select(Room)
-        total_rooms = len(self.session.exec(total_rooms_query).all())
-        
-        # Count occupied rooms
-        occupied_rooms_query = select(Room).where(Room.occupied == True)
-        occupied_rooms = len(self.session.exec(occupied_rooms_query).all())
+        # Count total and occupied rooms in a single pass
+        query = select(
+            func.count(),
+            func.coalesce(func.sum(case((Room.occupied == True, 1), else_=0)), 0)
+        ).select_from(Room)
+        total_rooms, occupied_rooms = self.session.exec(query).one()
         
         return occupied_rooms, total_rooms
     
@@ -111,137 +197,171 @@ class PredictionService:
     
     async def _calculate_avg_stay_duration(self) -> float:
         """Calculate average stay duration for completed bookings"""
-        # Get completed bookings from the last 30 days
+        # Average completed bookings from the last 30 days in SQL
         thirty_days_ago = get_current_time() - timedelta(days=30)
-        query = select(Booking).where(
+        query = select(func.avg(Booking.duration_days)).where(
             Booking.checkout_at != None,
             Booking.checkin_at >= thirty_days_ago
         )
-        bookings = self.session.exec(query).all()
-        
-        if not bookings:
-            return 0.0
-        
-        # Calculate durations
-        durations = []
-        for booking in bookings:
-            if booking.checkout_at and booking.checkin_at:
-                duration = (booking.checkout_at - booking.checkin_at).days or 1
-                durations.append(duration)
+        avg_stay_duration = self.session.exec(query).one()
         
-        return sum(durations) / len(durations) if durations else 0.0
+        return float(avg_stay_duration) if avg_stay_duration is not None else 0.0
     
     async def _calculate_avg_room_rate(self) -> float:
         """Calculate average room rate for active bookings"""
-        # Get active bookings
-        query = select(Booking).where(Booking.checkout_at == None)
-        bookings = self.session.exec(query).all()
+        # Count active bookings and average their prices in one query
+        query = select(func.count(Booking.id), func.avg(Booking.price)).where(Booking.checkout_at == None)
+        active_bookings, avg_price = self.session.exec(query).one()
         
-        if not bookings:
+        if not active_bookings:
             # Fall back to room rates if no active bookings
-            room_query = select(Room)
-            rooms = self.session.exec(room_query).all()
-            if not rooms:
-                return 0.0
-            return sum(room.rate_per_night for room in rooms) / len(rooms)
-        
-        # Calculate average rate
-        rates = [booking.price for booking in bookings if booking.price is not None]
-        return sum(rates) / len(rates) if rates else 0.0
+            avg_rate = self.session.exec(select(func.avg(Room.rate_per_night))).one()
+            return float(avg_rate) if avg_rate is not None else 0.0
+        
+        return float(avg_price) if avg_price is not None else 0.0
     
-    async def _predict_with_ml(self, dates: List[datetime]) -> List[Dict[str, Any]]:
-        """Make predictions using trained ML model"""
-        # Load model and scaler
+    def _load_model(self) -> Tuple[Any, Any]:
+        """Return the trained model and scaler, reloading only when the files change"""
+        model_mtime = self.model_path.stat().st_mtime
+        scaler_mtime = self.scaler_path.stat().st_mtime
+        
+        cache = PredictionService._model_cache
+        if cache and cache[0] == model_mtime and cache[1] == scaler_mtime:
+            return cache[2], cache[3]
+        
         model = joblib.load(self.model_path)
         scaler = joblib.load(self.scaler_path)
-        
+        PredictionService._model_cache = (model_mtime, scaler_mtime, model, scaler)
+        logger.info(f"Loaded occupancy model from {self.model_path}")
+        return model, scaler
+    
+    def _predict_features(self, model, scaler, weekdays: np.ndarray, months: np.ndarray,
+                          avg_stay_duration: float, avg_room_rate: float) -> np.ndarray:
+        """Run the forest over a feature matrix built from weekday/month arrays"""
         # Prepare features for prediction
-        features = []
-        for date in dates:
-            features.append([
-                date.weekday(),  # day_of_week
-                date.month,     # month
-                1 if is_weekend(date) else 0,  # is_weekend
-                await self._calculate_avg_stay_duration(),  # avg_stay_duration
-                await self._calculate_avg_room_rate()  # avg_room_rate
-            ])
-        
-        # Scale features
-        scaled_features = scaler.transform(features)
+        features = np.empty((len(weekdays), 5))
+        features[:, 0] = weekdays  # day_of_week
+        features[:, 1] = months  # month
+        features[:, 2] = weekdays >= 5  # is_weekend
+        features[:, 3] = avg_stay_duration
+        features[:, 4] = avg_room_rate
+        
+        # Scale features with the fitted statistics directly; the trees compare in float32
+        scaled_features = ((features - scaler.mean_) / scaler.scale_).astype(np.float32)
         
         # Make predictions
         predictions = model.predict(scaled_features)
         
         # Ensure predictions are within valid range [0, 1]
-        predictions = np.clip(predictions, 0, 1)
+        return np.clip(predictions, 0, 1)
+    
+    def _prediction_table(self, model, scaler, avg_stay_duration: float, avg_room_rate: float) -> np.ndarray:
+        """Return a 7x12 weekday/month prediction table for the current booking averages"""
+        cache = PredictionService._table_cache
+        if cache and cache[0] is model and cache[1] == avg_stay_duration and cache[2] == avg_room_rate:
+            return cache[3]
+        
+        # One forest pass over all 84 combinations costs about the same as a single week
+        weekdays = np.repeat(np.arange(7, dtype=np.int8), 12)
+        months = np.tile(np.arange(1, 13, dtype=np.int8), 7)
+        table = self._predict_features(model, scaler, weekdays, months, avg_stay_duration, avg_room_rate).reshape(7, 12)
+        PredictionService._table_cache = (model, avg_stay_duration, avg_room_rate, table)
+        return table
+    
+    async def _predict_with_ml(self, dates: List[datetime]) -> List[Dict[str, Any]]:
+        """Make predictions using trained ML model"""
+        # Load model and scaler
+        model, scaler = self._load_model()
         
-        # Format results
-        results = []
-        for i, date in enumerate(dates):
-            results.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "day_of_week": date.strftime("%A"),
-                "is_weekend": is_weekend(date),
-                "occupancy_rate": float(predictions[i]),
-                "occupancy_percentage": f"{float(predictions[i]):.2%}"
-            })
+        # Booking averages are the same for every date, so query them once
+        avg_stay_duration = await self._calculate_avg_stay_duration()
+        avg_room_rate = await self._calculate_avg_room_rate()
+        
+        weekdays = np.fromiter((date.weekday() for date in dates), dtype=np.int8, count=len(dates))
+        months = np.fromiter((date.month for date in dates), dtype=np.int8, count=len(dates))
+        
+        if len(dates) <= LOOKUP_MAX_DAYS:
+            # Short forecasts index a per-(weekday, month) table instead of running the forest
+            table = self._prediction_table(model, scaler, avg_stay_duration, avg_room_rate)
+            predictions = table[weekdays, months - 1]
+        else:
+            predictions = self._predict_features(model, scaler, weekdays, months, avg_stay_duration, avg_room_rate)
         
-        return results
+        return self._format_predictions(dates, weekdays, predictions)
+    
+    def _historical_occupancy_rate(self) -> Optional[float]:
+        """Average recorded occupancy rate, cached briefly since data points arrive slowly"""
+        cached = PredictionService._baseline_cache
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        
+        avg_rate = self.session.exec(select(func.avg(PredictionDataPoint.occupancy_rate))).one()
+        if avg_rate is None:
+            return None
+        
+        PredictionService._baseline_cache = (time.monotonic() + BASELINE_CACHE_SECONDS, float(avg_rate))
+        return float(avg_rate)
     
     async def _predict_with_heuristic(self, dates: List[datetime]) -> List[Dict[str, Any]]:
         """Make predictions using heuristic model when ML model is not available"""
-        # Get historical data if available
-        query = select(PredictionDataPoint)
-        data_points = self.session.exec(query).all()
-        
-        # Calculate baseline occupancy rate
-        if data_points:
-            baseline_rate = sum(dp.occupancy_rate for dp in data_points) / len(data_points)
-        else:
+        # Calculate baseline occupancy rate from historical data if available
+        baseline_rate = self._historical_occupancy_rate()
+        if baseline_rate is None:
             # If no historical data, use current occupancy
             current_occupied, total_rooms = await self._get_current_occupancy()
             baseline_rate = current_occupied / total_rooms if total_rooms > 0 else 0.5
         
-        # Apply heuristic rules
-        results = []
-        for date in dates:
-            # Weekend adjustment: higher occupancy on weekends
-            weekend_factor = 1.2 if is_weekend(date) else 1.0
-            
-            # Month adjustment: higher in peak seasons (adjust as needed)
-            month_factor = 1.1 if date.month in [6, 7, 8, 12] else 1.0
-            
-            # Calculate predicted rate with adjustments
-            predicted_rate = baseline_rate * weekend_factor * month_factor
-            
-            # Ensure rate is within valid range [0, 1]
-            predicted_rate = min(max(predicted_rate, 0.0), 1.0)
-            
-            results.append({
-                "date": date.strftime("%Y-%m-%d"),
-                "day_of_week": date.strftime("%A"),
-                "is_weekend": is_weekend(date),
-                "occupancy_rate": predicted_rate,
-                "occupancy_percentage": f"{predicted_rate:.2%}"
-            })
+        weekdays = np.fromiter((date.weekday() for date in dates), dtype=np.int8, count=len(dates))
+        months = np.fromiter((date.month for date in dates), dtype=np.int8, count=len(dates))
+        predicted_rates = heuristic_rates(weekdays, months, baseline_rate)
         
-        return results
+        return self._format_predictions(dates, weekdays, predicted_rates)
+    
+    def _format_predictions(self, dates: List[datetime], weekdays: np.ndarray, rates: np.ndarray) -> List[Dict[str, Any]]:
+        """Build the per-day prediction payload"""
+        return [
+            {
+                "date": date.strftime("%Y-%m-%d"),
+                "day_of_week": DAY_NAMES[weekday],
+                "is_weekend": weekday >= 5,
+                "occupancy_rate": rate,
+                "occupancy_percentage": f"{rate:.2%}"
+            }
+            for date, weekday, rate in zip(dates, weekdays.tolist(), rates.tolist())
+        ]
     
     async def get_prediction_data(self, limit: int = 100) -> List[PredictionDataPoint]:
         """Get historical prediction data points"""
         query = select(PredictionDataPoint).order_by(PredictionDataPoint.date.desc()).limit(limit)
         return self.session.exec(query).all()
     
+    @classmethod
+    def _get_pool(cls) -> ProcessPoolExecutor:
+        """Get the shared training worker pool, creating it on first use"""
+        if cls._pool is None:
+            cls._pool = ProcessPoolExecutor(max_workers=1)
+        return cls._pool
+    
+    @classmethod
+    async def aclose(cls) -> None:
+        """Shut down the shared training worker pool"""
+        if cls._pool is not None:
+            cls._pool.shutdown(wait=False, cancel_futures=True)
+        cls._pool = None
+    
+    def _count_data_points(self) -> int:
+        """Count recorded prediction data points"""
+        return self.session.exec(select(func.count()).select_from(PredictionDataPoint)).one()
+    
     async def create_training_task(self) -> BackgroundTask:
         """Create a background task for model training"""
         # Check if we have enough data points
-        query = select(PredictionDataPoint)
-        data_points_count = len(self.session.exec(query).all())
+        data_points_count = self._count_data_points()
         
         if data_points_count < self.min_data_points:
             raise ValueError(f"Not enough data points for training. Need at least {self.min_data_points}, but have {data_points_count}.")
         
-        task_id = str(uuid.uuid4())
+        task_id = generate_task_id()
         
         task = BackgroundTask(
             task_id=task_id,
@@ -269,75 +389,41 @@ class PredictionService:
         self.session.commit()
         
         try:
-            # Get data points
-            query = select(PredictionDataPoint)
-            data_points = self.session.exec(query).all()
-            
-            if len(data_points) < self.min_data_points:
-                raise ValueError(f"Not enough data points for training. Need at least {self.min_data_points}, but have {len(data_points)}.")
-            
-            # Prepare data for training
-            X = []
-            y = []
+            # Get training columns only; missing averages count as zero
+            query = select(
+                PredictionDataPoint.day_of_week,
+                PredictionDataPoint.month,
+                PredictionDataPoint.is_weekend,
+                func.coalesce(PredictionDataPoint.avg_stay_duration, 0),
+                func.coalesce(PredictionDataPoint.avg_room_rate, 0),
+                PredictionDataPoint.occupancy_rate
+            )
+            data_points_count = self._count_data_points()
             
-            for dp in data_points:
-                X.append([
-                    dp.day_of_week,
-                    dp.month,
-                    1 if dp.is_weekend else 0,
-                    dp.avg_stay_duration or 0,
-                    dp.avg_room_rate or 0
-                ])
-                y.append(dp.occupancy_rate)
+            if data_points_count < self.min_data_points:
+                raise ValueError(f"Not enough data points for training. Need at least {self.min_data_points}, but have {data_points_count}.")
             
-            X = np.array(X)
-            y = np.array(y)
+            # Stream rows in batches into one preallocated matrix
+            rows = self.session.exec(query.limit(data_points_count).execution_options(yield_per=TRAINING_FETCH_SIZE))
+            data = np.fromiter(chain.from_iterable(rows), dtype=np.float64, count=data_points_count * 6).reshape(data_points_count, 6)
+            X = data[:, :5]
+            y = data[:, 5]
             
-            # Split data into training and validation sets
-            X_train, X_val, y_train, y_val = train_test_split(X, y, test_size=0.2, random_state=42)
-            
-            # Scale features
-            scaler = StandardScaler()
-            X_train_scaled = scaler.fit_transform(X_train)
-            X_val_scaled = scaler.transform(X_val)
-            
-            # Train model
-            model = RandomForestRegressor(n_estimators=100, random_state=42)
-            model.fit(X_train_scaled, y_train)
-            
-            # Evaluate model
-            y_pred = model.predict(X_val_scaled)
-            mae = mean_absolute_error(y_val, y_pred)
-            rmse = np.sqrt(mean_squared_error(y_val, y_pred))
-            r2 = r2_score(y_val, y_pred)
-            
-            # Save model and scaler
-            joblib.dump(model, self.model_path)
-            joblib.dump(scaler, self.scaler_path)
-            
-            # Get feature importance
-            feature_names = ['day_of_week', 'month', 'is_weekend', 'avg_stay_duration', 'avg_room_rate']
-            feature_importance = {name: float(importance) for name, importance in zip(feature_names, model.feature_importances_)}
-            
-            # Prepare result
-            result = {
-                "algorithm": "RandomForestRegressor",
-                "features": feature_names,
-                "target": "occupancy_rate",
-                "metrics": {
-                    "mae": float(mae),
-                    "rmse": float(rmse),
-                    "r2": float(r2)
-                },
-                "feature_importance": feature_importance,
-                "training_samples": len(X_train),
-                "validation_samples": len(X_val),
-                "trained_at": get_current_time().isoformat()
-            }
+            # Fit in the worker process so the event loop keeps serving requests
+            try:
+                result = await asyncio.get_running_loop().run_in_executor(
+                    self._get_pool(), _fit_occupancy_model, X, y, str(self.model_path), str(self.scaler_path)
+                )
+            except BrokenProcessPool:
+                # The worker died (e.g. killed for memory); start a fresh pool on the next call
+                type(self)._pool = None
+                raise
+            result["trained_at"] = get_current_time().isoformat()
+            r2 = result["metrics"]["r2"]
             
             # Update task with result
             task.status = "completed"
-            task.result = str(result)
+            task.result = orjson.dumps(result).decode()
             task.completed_at = get_current_time()
             self.session.add(task)
             self.session.commit()
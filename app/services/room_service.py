@@ -1,5 +1,6 @@
 from typing import List, Optional, Dict, Any
 from sqlmodel import Session, select
+from sqlalchemy import func, insert
 
 from app.models.models import Room
 from app.schemas.schemas import RoomCreate, RoomUpdate, RoomType
@@ -14,9 +15,9 @@ class RoomService:
     async def create_room(self, room_data: RoomCreate) -> Room:
         """Create a new room"""
         # Check if room with same number already exists
-        query = select(Room).where(Room.number == room_data.number)
+        query = select(Room.number).where(Room.number == room_data.number).limit(1)
         existing_room = self.session.exec(query).first()
-        if existing_room:
+        if existing_room is not None:
             logger.warning(f"Attempted to create duplicate room: {room_data.number}")
             raise ConflictError(f"Room with number {room_data.number} already exists")
         
@@ -71,7 +72,7 @@ class RoomService:
                          room_type: Optional[RoomType] = None,
                          occupied: Optional[bool] = None) -> int:
         """Count total rooms with optional filters"""
-        query = select(Room)
+        query = select(func.count()).select_from(Room)
         
         # Apply room type filter if provided
         if room_type:
@@ -81,7 +82,7 @@ class RoomService:
         if occupied is not None:
             query = query.where(Room.occupied == occupied)
         
-        return len(self.session.exec(query).all())
+        return self.session.exec(query).one()
     
     async def update_room(self, room_number: int, room_data: RoomUpdate) -> Room:
         """Update room information"""
@@ -95,9 +96,7 @@ class RoomService:
         # Update updated_at timestamp
         room.updated_at = get_current_time()
         
-        self.session.add(room)
         self.session.commit()
-        self.session.refresh(room)
         
         logger.info(f"Updated room: {room.number} - {room.room_type}")
         return room
@@ -130,9 +129,7 @@ class RoomService:
         room.current_guest_id = guest_id
         room.updated_at = get_current_time()
         
-        self.session.add(room)
         self.session.commit()
-        self.session.refresh(room)
         
         logger.info(f"Room {room_number} occupied by guest {guest_id}")
         return room
@@ -151,9 +148,7 @@ class RoomService:
         room.current_guest_id = None
         room.updated_at = get_current_time()
         
-        self.session.add(room)
         self.session.commit()
-        self.session.refresh(room)
         
         logger.info(f"Room {room_number} vacated")
         return room
@@ -181,34 +176,42 @@ class RoomService:
             RoomType.SUITE: {"count": 3, "rate": 2500.0}
         }
         
-        # Create rooms
-        created_count = 0
+        # Build all rooms up front and insert them in one executemany
+        now = get_current_time()
+        rooms = []
         room_number = 101
         
         for room_type, config in room_types.items():
             for _ in range(config["count"]):
-                room = Room(
-                    number=room_number,
-                    room_type=room_type,
-                    rate_per_night=config["rate"],
-                    occupied=False,
-                    created_at=get_current_time()
-                )
-                
-                self.session.add(room)
-                created_count += 1
+                rooms.append({
+                    "number": room_number,
+                    "room_type": room_type,
+                    "rate_per_night": config["rate"],
+                    "occupied": False,
+                    "created_at": now
+                })
                 room_number += 1
         
+        self.session.exec(insert(Room), params=rooms)
         self.session.commit()
+        created_count = len(rooms)
         
         logger.info(f"Seeded {created_count} rooms")
         return {"seeded": True, "created_count": created_count}
     
     async def get_occupancy_stats(self) -> Dict[str, Any]:
         """Get room occupancy statistics"""
-        total_rooms = await self.count_rooms()
-        occupied_rooms = await self.count_rooms(occupied=True)
-        available_rooms = await self.count_rooms(occupied=False)
+        # Count rooms per (room_type, occupied) pair in a single query
+        query = select(Room.room_type, Room.occupied, func.count()).group_by(Room.room_type, Room.occupied)
+        counts = {}
+        total_rooms = 0
+        occupied_rooms = 0
+        for room_type, occupied, count in self.session.exec(query):
+            counts[(room_type, occupied)] = count
+            total_rooms += count
+            if occupied:
+                occupied_rooms += count
+        available_rooms = total_rooms - occupied_rooms
         
         occupancy_rate = (occupied_rooms / total_rooms * 100) if total_rooms > 0 else 0
         
@@ -217,8 +220,8 @@ class RoomService:
         occupancy_by_type = {}
         
         for room_type in room_types:
-            total_type = await self.count_rooms(room_type=room_type)
-            occupied_type = await self.count_rooms(room_type=room_type, occupied=True)
+            occupied_type = counts.get((room_type, True), 0)
+            total_type = occupied_type + counts.get((room_type, False), 0)
             occupancy_by_type[room_type] = {
                 "total": total_type,
                 "occupied": occupied_type,
@@ -251,9 +254,7 @@ class RoomService:
         
         room.updated_at = get_current_time()
         
-        self.session.add(room)
         self.session.commit()
-        self.session.refresh(room)
         
         logger.info(f"Room {room_number} maintenance mode: {maintenance_mode}")
         return room
\ No newline at end of file
@@ -1,46 +1,108 @@
-import uuid
-from typing import Dict, Any, List, Optional, Union
+import ast
+import asyncio
+import orjson
+from functools import cached_property
+from typing import Dict, Any, Iterator, List, Optional, Union
 from datetime import datetime, timedelta
 
 from sqlmodel import Session, select
+from sqlalchemy import bindparam, delete, inspect, update
 from app.models.models import BackgroundTask
-from app.utils.helpers import get_current_time
+from app.utils.helpers import get_current_time, generate_task_id
 from app.config.config import settings
 from app.services.ocr_service import OCRService
 from app.services.prediction_service import PredictionService
 from app.services.digilocker_service import DigiLockerService
 from loguru import logger
 
+# Hot statements are built once at import; values are bound per call
+_TASK_BY_TASK_ID = select(BackgroundTask).where(BackgroundTask.task_id == bindparam("task_id"))
+
+_PENDING_TASK_IDS = (
+    select(BackgroundTask.id)
+    .where(BackgroundTask.status == "pending")
+    .order_by(BackgroundTask.created_at)
+    .limit(bindparam("limit"))
+)
+
+def _claim_statement(pending_ids):
+    """Build the UPDATE ... RETURNING that marks the selected pending tasks as running"""
+    return (
+        update(BackgroundTask)
+        .where(BackgroundTask.id.in_(pending_ids.scalar_subquery()))
+        .values(status="running", updated_at=bindparam("now"))
+        .returning(BackgroundTask)
+    )
+
+_CLAIM_PENDING = _claim_statement(_PENDING_TASK_IDS)
+_CLAIM_PENDING_SKIP_LOCKED = _claim_statement(_PENDING_TASK_IDS.with_for_update(skip_locked=True))
+
+# Rows fetched per round-trip when streaming tasks for export
+EXPORT_FETCH_SIZE = 200
+
+_CLAIM_TASK = (
+    update(BackgroundTask)
+    .where(BackgroundTask.task_id == bindparam("claim_task_id"), BackgroundTask.status == "pending")
+    .values(status="running", updated_at=bindparam("now"))
+    .returning(BackgroundTask)
+)
+
+def _load_params(raw: str) -> Dict[str, Any]:
+    """Parse task params stored as JSON, or as the Python repr older rows were written with"""
+    try:
+        return orjson.loads(raw)
+    except orjson.JSONDecodeError:
+        return ast.literal_eval(raw)
+
 class TaskService:
 
     def __init__(self, session: Session):
         self.session = session
-        self.ocr_service = OCRService(session)
-        self.prediction_service = PredictionService(session)
-        self.digilocker_service = DigiLockerService(session)
+        
+        # Task type -> handler, looked up once per task instead of an if/elif chain
+        self._handlers = {
+            "ocr_processing": self._execute_ocr_task,
+            "ml_training": self._execute_ml_task,
+            "digilocker_fetch": self._execute_digilocker_task,
+            "system_backup": self._execute_backup_task,
+        }
+    
+    @cached_property
+    def ocr_service(self) -> OCRService:
+        """OCR service, created on first use"""
+        return OCRService(self.session)
+    
+    @cached_property
+    def prediction_service(self) -> PredictionService:
+        """Prediction service, created on first use"""
+        return PredictionService(self.session)
+    
+    @cached_property
+    def digilocker_service(self) -> DigiLockerService:
+        """DigiLocker service, created on first use"""
+        return DigiLockerService(self.session)
     
     async def create_task(self, task_type: str, params: Dict[str, Any] = None) -> BackgroundTask:
         """Create a new background task"""
-        task_id = str(uuid.uuid4())
+        task_id = generate_task_id()
         
         task = BackgroundTask(
             task_id=task_id,
             task_type=task_type,
-            params=str(params) if params else None,
+            params=orjson.dumps(params).decode() if params else None,
             status="pending",
             created_at=get_current_time()
         )
         
         self.session.add(task)
         self.session.commit()
-        self.session.refresh(task)
         
         logger.info(f"Created background task: {task_id} of type: {task_type}")
         return task
     
     async def get_task(self, task_id: str) -> Optional[BackgroundTask]:
         """Get a task by ID"""
-        return self.session.get(BackgroundTask, task_id)
+        return self.session.exec(_TASK_BY_TASK_ID, params={"task_id": task_id}).first()
     
     async def get_tasks(self, 
                        status: Optional[str] = None, 
@@ -59,6 +121,21 @@ class TaskService:
         query = query.order_by(BackgroundTask.created_at.desc()).offset(skip).limit(limit)
         return self.session.exec(query).all()
     
+    def iter_tasks(self, 
+                   status: Optional[str] = None, 
+                   task_type: Optional[str] = None) -> Iterator[BackgroundTask]:
+        """Stream tasks with optional filtering in batches without materialising the full list"""
+        query = select(BackgroundTask)
+        
+        if status:
+            query = query.where(BackgroundTask.status == status)
+        
+        if task_type:
+            query = query.where(BackgroundTask.task_type == task_type)
+        
+        query = query.order_by(BackgroundTask.created_at.desc()).execution_options(yield_per=EXPORT_FETCH_SIZE)
+        yield from self.session.exec(query)
+    
     async def update_task_status(self, task_id: str, status: str, 
                                result: Optional[str] = None,
                                error: Optional[str] = None) -> BackgroundTask:
@@ -78,49 +155,68 @@ class TaskService:
         if error is not None:
             task.error = error
         
-        self.session.add(task)
         self.session.commit()
-        self.session.refresh(task)
         
         logger.info(f"Updated task {task_id} status to {status}")
         return task
     
     async def execute_task(self, task_id: str) -> BackgroundTask:
         """Execute a pending task"""
-        task = await self.get_task(task_id)
-        if not task:
-            raise ValueError(f"Task not found: {task_id}")
-        
-        if task.status != "pending":
+        # Check and mark running in one statement, so a concurrent claimer can't also run it
+        task = self.session.exec(_CLAIM_TASK, params={"claim_task_id": task_id, "now": get_current_time()}).scalars().one_or_none()
+        if task is None:
+            task = await self.get_task(task_id)
+            if not task:
+                raise ValueError(f"Task not found: {task_id}")
             logger.warning(f"Task {task_id} is not pending (current status: {task.status})")
             return task
         
-        # Update task to running
-        await self.update_task_status(task_id, "running")
+        self.session.commit()
+        logger.info(f"Updated task {task_id} status to running")
         
+        return await self.execute_claimed_task(task)
+    
+    async def execute_claimed_task(self, task: BackgroundTask) -> BackgroundTask:
+        """Execute a task that has already been marked as running"""
         try:
             # Execute task based on type
-            if task.task_type == "ocr_processing":
-                result = await self._execute_ocr_task(task)
-            elif task.task_type == "ml_training":
-                result = await self._execute_ml_task(task)
-            elif task.task_type == "digilocker_fetch":
-                result = await self._execute_digilocker_task(task)
-            elif task.task_type == "system_backup":
-                result = await self._execute_backup_task(task)
-            else:
+            handler = self._handlers.get(task.task_type)
+            if handler is None:
                 raise ValueError(f"Unknown task type: {task.task_type}")
+            result = await handler(task)
             
             # Update task to completed with result
-            await self.update_task_status(task_id, "completed", result=str(result))
+            task.status = "completed"
+            task.result = orjson.dumps(result).decode()
             
         except Exception as e:
-            logger.error(f"Task {task_id} execution failed: {str(e)}")
+            logger.error(f"Task {task.task_id} execution failed: {str(e)}")
             # Update task to failed with error
-            await self.update_task_status(task_id, "failed", error=str(e))
+            task.status = "failed"
+            task.error = str(e)
         
-        # Refresh task
-        return await self.get_task(task_id)
+        task.completed_at = get_current_time()
+        logger.info(f"Updated task {task.task_id} status to {task.status}")
+        self.session.commit()
+        
+        return task
+    
+    async def claim_pending_tasks(self, limit: int) -> List[BackgroundTask]:
+        """Mark up to `limit` of the oldest pending tasks as running in one statement"""
+        # Concurrent PostgreSQL workers skip rows another worker is already claiming
+        if self.session.get_bind().dialect.name == "postgresql":
+            statement = _CLAIM_PENDING_SKIP_LOCKED
+        else:
+            statement = _CLAIM_PENDING
+        
+        tasks = self.session.exec(statement, params={"limit": limit, "now": get_current_time()}).scalars().all()
+        
+        # RETURNING order is unspecified; run the oldest first
+        tasks.sort(key=lambda task: task.created_at)
+        self.session.commit()
+        
+        logger.info(f"Claimed {len(tasks)} pending tasks")
+        return tasks
     
     async def _execute_ocr_task(self, task: BackgroundTask) -> Dict[str, Any]:
         """Execute OCR processing task"""
@@ -128,8 +224,7 @@ class TaskService:
             raise ValueError("OCR task requires parameters")
         
         # Parse params
-        import ast
-        params = ast.literal_eval(task.params)
+        params = _load_params(task.params)
         
         document_path = params.get("document_path")
         if not document_path:
@@ -153,8 +248,7 @@ class TaskService:
             raise ValueError("DigiLocker task requires parameters")
         
         # Parse params
-        import ast
-        params = ast.literal_eval(task.params)
+        params = _load_params(task.params)
         
         guest_id = params.get("guest_id")
         if not guest_id:
@@ -165,23 +259,6 @@ class TaskService:
         
         return {"documents": documents}
     
-    async def get_tasks(self, 
-                       status: Optional[str] = None, 
-                       task_type: Optional[str] = None,
-                       limit: int = 100,
-                       skip: int = 0) -> List[BackgroundTask]:
-        """Get tasks with optional filtering"""
-        query = select(BackgroundTask)
-        
-        if status:
-            query = query.where(BackgroundTask.status == status)
-        
-        if task_type:
-            query = query.where(BackgroundTask.task_type == task_type)
-        
-        query = query.order_by(BackgroundTask.created_at.desc()).offset(skip).limit(limit)
-        return self.session.exec(query).all()
-    
     async def _execute_backup_task(self, task: BackgroundTask) -> Dict[str, Any]:
         """Execute system backup task"""
         from app.utils.backup import create_backup
@@ -195,17 +272,12 @@ class TaskService:
         """Clean up old completed or failed tasks"""
         cutoff_date = get_current_time() - timedelta(days=days)
         
-        query = select(BackgroundTask).where(
+        statement = delete(BackgroundTask).where(
             BackgroundTask.status.in_(["completed", "failed"]),
             BackgroundTask.completed_at < cutoff_date
         )
         
-        tasks_to_delete = self.session.exec(query).all()
-        count = len(tasks_to_delete)
-        
-        for task in tasks_to_delete:
-            self.session.delete(task)
-        
+        count = self.session.exec(statement).rowcount
         self.session.commit()
         logger.info(f"Cleaned up {count} old tasks")
         
@@ -213,35 +285,42 @@ class TaskService:
     
     async def retry_failed_task(self, task_id: str) -> BackgroundTask:
         """Retry a failed task"""
-        task = await self.get_task(task_id)
-        if not task:
-            raise ValueError(f"Task not found: {task_id}")
-        
-        if task.status != "failed":
-            raise ValueError(f"Task {task_id} is not failed (current status: {task.status})")
+        # Reset task status; the status predicate keeps concurrent retries from racing
+        statement = (
+            update(BackgroundTask)
+            .where(BackgroundTask.task_id == task_id, BackgroundTask.status == "failed")
+            .values(status="pending", error=None, result=None, completed_at=None, updated_at=get_current_time())
+            .returning(BackgroundTask)
+        )
+        task = self.session.exec(statement).scalars().one_or_none()
         
-        # Reset task status
-        task.status = "pending"
-        task.error = None
-        task.result = None
-        task.completed_at = None
-        task.updated_at = get_current_time()
+        if task is None:
+            current_status = self.session.exec(
+                select(BackgroundTask.status).where(BackgroundTask.task_id == task_id)
+            ).first()
+            if current_status is None:
+                raise ValueError(f"Task not found: {task_id}")
+            raise ValueError(f"Task {task_id} is not failed (current status: {current_status})")
         
-        self.session.add(task)
         self.session.commit()
-        self.session.refresh(task)
         
         logger.info(f"Reset failed task {task_id} for retry")
         return task
     
     async def process_pending_tasks(self, limit: int = 10) -> List[BackgroundTask]:
         """Process a batch of pending tasks"""
-        query = select(BackgroundTask).where(BackgroundTask.status == "pending").order_by(BackgroundTask.created_at).limit(limit)
-        pending_tasks = self.session.exec(query).all()
+        claimed_tasks = await self.claim_pending_tasks(limit)
+        # Identity keys survive the claim commit, so no attribute reload is needed here
+        claimed_ids = [inspect(task).identity[0] for task in claimed_tasks]
+        
+        # Run claimed tasks concurrently, each with its own session so commits don't interleave
+        slots = asyncio.Semaphore(settings.TASK_CONCURRENCY)
+        bind = self.session.get_bind()
         
-        processed_tasks = []
-        for task in pending_tasks:
-            processed_task = await self.execute_task(task.task_id)
-            processed_tasks.append(processed_task)
+        async def run(task_id: int) -> BackgroundTask:
+            async with slots:
+                with Session(bind, expire_on_commit=False) as session:
+                    task = session.get(BackgroundTask, task_id)
+                    return await TaskService(session).execute_claimed_task(task)
         
-        return processed_tasks
\ No newline at end of file
+        return list(await asyncio.gather(*(run(task_id) for task_id in claimed_ids)))
\ No newline at end of file
@@ -1,36 +1,47 @@
-from typing import List, Optional
+from typing import Iterator, List, Optional
 from datetime import datetime, timedelta
 import secrets
+import asyncio
 from sqlmodel import Session, select
+from sqlalchemy import bindparam, delete, exists, func
+from sqlalchemy.exc import IntegrityError
 
-from app.models.models import User
+from app.models.models import User, PasswordResetToken
 from app.schemas.schemas import UserCreate, UserUpdate
 from app.auth.auth import get_password_hash, verify_password
 from app.utils.errors import NotFoundError, BadRequestError
 from loguru import logger
 
+# Hot lookups are built once at import; values are bound per call
+_USER_BY_ID = select(User).where(User.id == bindparam("user_id"))
+_USER_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+
+# Rows fetched per round-trip when streaming users for export
+EXPORT_FETCH_SIZE = 200
+
 class UserService:
     def __init__(self, session: Session):
         self.session = session
-        self.password_reset_tokens = {}  # In-memory storage for reset tokens
     
     async def create_user(self, user_data: UserCreate) -> User:
-        # Check if email already exists
-        existing_user = await self.get_user_by_email(user_data.email)
-        if existing_user:
-            raise ValueError(f"User with email {user_data.email} already exists")
-        
         # Create new user
-        hashed_password = get_password_hash(user_data.password)
+        # Hashing is deliberately slow, so run it off the event loop
+        hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
         user = User(
+            username=user_data.username,
             email=user_data.email,
             hashed_password=hashed_password,
             full_name=user_data.full_name,
             role=user_data.role
         )
         
+        # The unique email/username indexes reject duplicates without a pre-check query
         self.session.add(user)
-        self.session.commit()
+        try:
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            raise ValueError(f"User with email {user_data.email} or username {user_data.username} already exists")
         self.session.refresh(user)
         
         logger.info(f"Created new user: {user.email} with role {user.role}")
@@ -40,18 +51,16 @@ class UserService:
         user = await self.get_user_by_email(email)
         if not user:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await asyncio.to_thread(verify_password, password, user.hashed_password):
             return None
         return user
     
     async def get_user(self, user_id: int) -> Optional[User]:
-        statement = select(User).where(User.id == user_id)
-        results = self.session.exec(statement)
+        results = self.session.exec(_USER_BY_ID, params={"user_id": user_id})
         return results.first()
     
     async def get_user_by_email(self, email: str) -> Optional[User]:
-        statement = select(User).where(User.email == email)
-        results = self.session.exec(statement)
+        results = self.session.exec(_USER_BY_EMAIL, params={"email": email})
         return results.first()
     
     async def get_users(self, limit: int = 100, skip: int = 0) -> List[User]:
@@ -59,6 +68,11 @@ class UserService:
         results = self.session.exec(statement)
         return results.all()
     
+    def iter_users(self) -> Iterator[User]:
+        """Stream all users in batches without materialising the full list"""
+        statement = select(User).order_by(User.id).execution_options(yield_per=EXPORT_FETCH_SIZE)
+        yield from self.session.exec(statement)
+    
     async def update_user(self, user_id: int, user_data: UserUpdate) -> User:
         user = await self.get_user(user_id)
         if not user:
@@ -80,13 +94,11 @@ class UserService:
             user.role = user_data.role
         
         if user_data.password is not None:
-            user.hashed_password = get_password_hash(user_data.password)
+            user.hashed_password = await asyncio.to_thread(get_password_hash, user_data.password)
         
-        self.session.add(user)
         self.session.commit()
-        self.session.refresh(user)
         
-        logger.info(f"Updated user: {user.id}")
+        logger.info(f"Updated user: {user_id}")
         return user
     
     async def delete_user(self, user_id: int) -> None:
@@ -94,41 +106,44 @@ class UserService:
         if not user:
             raise NotFoundError(f"User not found: {user_id}")
         
+        # Reset tokens reference the user, so they go first in the same transaction
+        self.session.exec(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
         self.session.delete(user)
         self.session.commit()
         
         logger.info(f"Deleted user: {user.id}")
     
     async def count_admin_users(self) -> int:
-        statement = select(User).where(User.role == "admin")
-        results = self.session.exec(statement)
-        return len(results.all())
+        statement = select(func.count()).select_from(User).where(User.role == "admin")
+        return self.session.exec(statement).one()
     
     async def create_password_reset_token(self, user_id: int) -> str:
         # Generate a secure token
         token = secrets.token_urlsafe(32)
         
-        # Store token with expiration time (24 hours)
+        # Store token with expiration time (24 hours) so any worker can verify it
         expiration = datetime.utcnow() + timedelta(hours=24)
-        self.password_reset_tokens[token] = {"user_id": user_id, "expires": expiration}
+        self.session.add(PasswordResetToken(token=token, user_id=user_id, expires_at=expiration))
+        self.session.commit()
         
         logger.info(f"Created password reset token for user: {user_id}")
         return token
     
     async def verify_password_reset_token(self, token: str) -> Optional[int]:
         # Check if token exists and is valid
-        token_data = self.password_reset_tokens.get(token)
+        token_data = self.session.get(PasswordResetToken, token)
         if not token_data:
             return None
         
         # Check if token has expired
-        if datetime.utcnow() > token_data["expires"]:
+        if datetime.utcnow() > token_data.expires_at:
             # Remove expired token
-            del self.password_reset_tokens[token]
+            self.session.delete(token_data)
+            self.session.commit()
             return None
         
         # Token is valid, return user ID
-        return token_data["user_id"]
+        return token_data.user_id
     
     async def update_password(self, user_id: int, new_password: str) -> None:
         user = await self.get_user(user_id)
@@ -136,29 +151,26 @@ class UserService:
             raise NotFoundError(f"User not found: {user_id}")
         
         # Update password
-        user.hashed_password = get_password_hash(new_password)
+        user.hashed_password = await asyncio.to_thread(get_password_hash, new_password)
+        
+        # Remove any reset tokens for this user in the same transaction
+        self.session.exec(delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id))
         
-        self.session.add(user)
         self.session.commit()
         
         logger.info(f"Updated password for user: {user_id}")
-        
-        # Remove any reset tokens for this user
-        for token, data in list(self.password_reset_tokens.items()):
-            if data["user_id"] == user_id:
-                del self.password_reset_tokens[token]
     
     async def create_initial_admin(self, email: str, password: str, full_name: str) -> User:
         """Create initial admin user if no users exist"""
         # Check if any users exist
-        statement = select(User)
-        results = self.session.exec(statement)
-        if results.first():
+        statement = select(exists().select_from(User))
+        if self.session.exec(statement).one():
             logger.info("Initial admin creation skipped - users already exist")
             return None
         
         # Create admin user
         admin = UserCreate(
+            username="admin",
             email=email,
             password=password,
             full_name=full_name,
@@ -1,21 +1,340 @@
+import io
 import os
+import time
 import shutil
+import asyncio
 import tarfile
+import threading
+import subprocess
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor
 import gzip
 import json
 import csv
+from itertools import chain, count, islice
+from operator import itemgetter
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple, Callable, Union, Iterable, Iterator
 
 import sqlalchemy
 from sqlmodel import Session, select
+from sqlalchemy import delete, insert
 from app.config.config import settings
 from app.db.database import engine
 from app.models.models import Guest, Room, Booking, PredictionDataPoint, BackgroundTask, User
 from app.utils.helpers import get_current_time
 from loguru import logger
 
+# Backup archives are named BACKUP_PREFIX + YYYYmmdd_HHMMSS + BACKUP_SUFFIX
+BACKUP_PREFIX = "hotel_system_backup_"
+BACKUP_SUFFIX = ".tar.gz"
+
+# Rows fetched per round-trip when dumping a table to CSV
+BACKUP_FETCH_SIZE = 2000
+# Tables dumped concurrently, each on its own pooled connection
+BACKUP_DUMP_WORKERS = 4
+
+# Chunk size for archive reads, writes and member copies; tarfile's default is 16 KiB
+ARCHIVE_BUFFER_SIZE = 2 * 1024 * 1024
+
+# CSV rows inserted per executemany when restoring without COPY
+RESTORE_BATCH_SIZE = 5000
+
+# Concurrent file writes when extracting a backup; deep queues pay off most on network filesystems
+RESTORE_WRITE_WORKERS = 32
+# Archive members up to this size are buffered and written by the pool; larger ones stream inline
+RESTORE_BUFFER_MAX = 1024 * 1024
+
+def _parse_backup_timestamp(stamp: str) -> datetime:
+    """Parse a YYYYmmdd_HHMMSS filename stamp by slicing; much cheaper than strptime"""
+    if len(stamp) != 15 or stamp[8] != "_":
+        raise ValueError(f"Not a backup timestamp: {stamp}")
+    return datetime(
+        int(stamp[0:4]), int(stamp[4:6]), int(stamp[6:8]),
+        int(stamp[9:11]), int(stamp[11:13]), int(stamp[13:15])
+    )
+
+def _gzip_command() -> Optional[List[str]]:
+    """Pick an external gzip, preferring parallel pigz; None if neither is installed"""
+    pigz = shutil.which("pigz")
+    if pigz:
+        return [pigz, "-p", str(os.cpu_count() or 1)]
+    gzip_path = shutil.which("gzip")
+    return [gzip_path] if gzip_path else None
+
+def _add_entries(tar: tarfile.TarFile, entries: Iterable[Tuple[Union[str, bytes, None], str]]) -> None:
+    """Add (source, arcname) entries: a path recursively, bytes as a file, None as an empty directory"""
+    for source, arcname in entries:
+        if isinstance(source, str):
+            tar.add(source, arcname=arcname)
+            continue
+        
+        info = tarfile.TarInfo(arcname)
+        info.mtime = int(time.time())
+        if source is None:
+            info.type = tarfile.DIRTYPE
+            info.mode = 0o755
+            tar.addfile(info)
+        else:
+            info.size = len(source)
+            info.mode = 0o644
+            tar.addfile(info, io.BytesIO(source))
+
+def _write_archive(backup_path: str, entries: Iterable[Tuple[Union[str, bytes, None], str]]) -> None:
+    """Stream entries into a gzipped tar, compressing in pigz/gzip when available"""
+    gzip_cmd = _gzip_command()
+    # 0 or unset means gzip's own default compromise
+    level = settings.BACKUP_COMPRESSLEVEL or 6
+    
+    try:
+        with open(backup_path, "wb", buffering=ARCHIVE_BUFFER_SIZE) as out:
+            if gzip_cmd is None:
+                # Regular w:gz; for gzip the level, not stream vs. regular mode, is what costs time
+                with tarfile.open(fileobj=out, mode="w:gz", compresslevel=level, copybufsize=ARCHIVE_BUFFER_SIZE) as tar:
+                    _add_entries(tar, entries)
+                return
+            
+            # tarfile only frames the stream; deflate runs in the child process
+            proc = subprocess.Popen(
+                gzip_cmd + [f"-{level}", "-c"],
+                stdin=subprocess.PIPE, stdout=out, stderr=subprocess.PIPE, bufsize=ARCHIVE_BUFFER_SIZE
+            )
+            try:
+                with tarfile.open(fileobj=proc.stdin, mode="w|", bufsize=ARCHIVE_BUFFER_SIZE, copybufsize=ARCHIVE_BUFFER_SIZE) as tar:
+                    _add_entries(tar, entries)
+            finally:
+                with suppress(BrokenPipeError):
+                    proc.stdin.close()
+                stderr = proc.stderr.read()
+                proc.wait()
+            if proc.returncode != 0:
+                raise RuntimeError(f"{os.path.basename(gzip_cmd[0])} exited with {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+    except Exception:
+        # Don't leave a truncated archive where list_backups would pick it up
+        if os.path.exists(backup_path):
+            os.unlink(backup_path)
+        raise
+
+def _write_file(path: str, data: bytes, slots: threading.BoundedSemaphore) -> None:
+    """Write one buffered archive member, then free its slot"""
+    try:
+        with open(path, "wb") as f:
+            f.write(data)
+    finally:
+        slots.release()
+
+def _extract_members(tar: tarfile.TarFile, dest_dir: str) -> None:
+    """Extract directories and regular files, fanning small-file writes out to a thread pool"""
+    created_dirs = {dest_dir}
+    # Member names are appended to this, saving an os.path.join per member
+    dest_prefix = os.path.join(dest_dir, "")
+    # Bounds buffered-but-unwritten members so memory stays flat on slow disks
+    slots = threading.BoundedSemaphore(RESTORE_WRITE_WORKERS * 2)
+    
+    with ThreadPoolExecutor(max_workers=RESTORE_WRITE_WORKERS) as pool:
+        writes = []
+        for member in tar:
+            name = os.path.normpath(member.name)
+            if os.path.isabs(name) or name == os.pardir or name.startswith(os.pardir + os.sep):
+                raise ValueError(f"Invalid backup format: unsafe path {member.name}")
+            path = dest_prefix + name
+            
+            # One makedirs per distinct directory, not per file
+            directory = path if member.isdir() else os.path.dirname(path)
+            if directory not in created_dirs:
+                os.makedirs(directory, exist_ok=True)
+                created_dirs.add(directory)
+            
+            # create_backup only writes directories and regular files
+            if not member.isfile():
+                continue
+            
+            source = tar.extractfile(member)
+            if member.size <= RESTORE_BUFFER_MAX:
+                slots.acquire()
+                writes.append(pool.submit(_write_file, path, source.read(), slots))
+            else:
+                with open(path, "wb") as f:
+                    shutil.copyfileobj(source, f, ARCHIVE_BUFFER_SIZE)
+        
+        for write in writes:
+            write.result()
+
+def _extract_archive(backup_path: str, dest_dir: str) -> None:
+    """Extract a gzipped tar into dest_dir, decompressing in pigz/gzip when available"""
+    gzip_cmd = _gzip_command()
+    
+    if gzip_cmd is None:
+        with tarfile.open(backup_path, "r:gz") as tar:
+            _extract_members(tar, dest_dir)
+        return
+    
+    with open(backup_path, "rb") as src:
+        proc = subprocess.Popen(
+            gzip_cmd + ["-dc"],
+            stdin=src, stdout=subprocess.PIPE, stderr=subprocess.PIPE, bufsize=ARCHIVE_BUFFER_SIZE
+        )
+        try:
+            with tarfile.open(fileobj=proc.stdout, mode="r|", bufsize=ARCHIVE_BUFFER_SIZE) as tar:
+                _extract_members(tar, dest_dir)
+            # Drain the record padding after the end-of-archive marker so gzip can exit
+            proc.stdout.read()
+        finally:
+            proc.stdout.close()
+            stderr = proc.stderr.read()
+            proc.wait()
+    if proc.returncode != 0:
+        raise RuntimeError(f"{os.path.basename(gzip_cmd[0])} exited with {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+
+def _copy_table_to_csv(model, file_path: str) -> int:
+    """Dump a table to CSV with PostgreSQL's COPY, formatted server-side; returns the row count"""
+    table = engine.dialect.identifier_preparer.quote(model.__tablename__)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with open(file_path, "w", newline="") as f:
+            cursor.copy_expert(f"COPY {table} TO STDOUT WITH CSV HEADER", f)
+        return cursor.rowcount
+    finally:
+        raw.close()
+
+def _copy_csv_to_table(model, file_path: str) -> int:
+    """Replace a table's rows from a CSV backup with PostgreSQL's COPY; returns the row count"""
+    preparer = engine.dialect.identifier_preparer
+    table = preparer.quote(model.__tablename__)
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        with open(file_path, "r", newline="") as f:
+            # Name the columns from the header so file and table column order needn't match
+            header = next(csv.reader(f))
+            columns = ", ".join(preparer.quote(name) for name in header)
+            cursor.execute(f"DELETE FROM {table}")
+            cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH CSV", f)
+        count = cursor.rowcount
+        raw.commit()
+        return count
+    finally:
+        raw.close()
+
+def _csv_row(record, datetime_columns: List[str]) -> Dict[str, Any]:
+    """Convert a record to a CSV row with datetimes in ISO format"""
+    row = record.dict()
+    for name in datetime_columns:
+        value = row[name]
+        if value is not None:
+            row[name] = value.isoformat()
+    return row
+
+def _parse_bool(value: str) -> bool:
+    """Parse booleans written by either the CSV writer (True) or COPY (t)"""
+    return value.lower() in ("true", "t", "1")
+
+def _csv_converters(model) -> Dict[str, Tuple[Optional[Callable[[str], Any]], bool]]:
+    """Map each column to (converter from CSV text or None for strings, nullable)"""
+    converters = {}
+    for column in model.__table__.columns:
+        if isinstance(column.type, sqlalchemy.DateTime):
+            convert = datetime.fromisoformat
+        elif isinstance(column.type, sqlalchemy.Boolean):
+            convert = _parse_bool
+        elif isinstance(column.type, sqlalchemy.Integer):
+            convert = int
+        elif isinstance(column.type, sqlalchemy.Float):
+            convert = float
+        else:
+            convert = None
+        converters[column.name] = (convert, column.nullable)
+    return converters
+
+def _parse_csv_row(row: Dict[str, str], converters: Dict[str, Tuple[Optional[Callable[[str], Any]], bool]]) -> Dict[str, Any]:
+    """Turn one CSV row back into column values; empty cells become NULL"""
+    record = {}
+    for key, value in row.items():
+        if key not in converters:
+            # Column dropped since the backup was taken
+            continue
+        convert, nullable = converters[key]
+        if value == "" and (convert is not None or nullable):
+            record[key] = None
+        elif convert is not None:
+            record[key] = convert(value)
+        else:
+            record[key] = value
+    return record
+
+def _dump_model(model, db_dir: str) -> None:
+    """Dump one model's table to a CSV file in db_dir, on its own connection"""
+    model_name = model.__name__
+    file_path = os.path.join(db_dir, f"{model_name.lower()}.csv")
+    
+    # psycopg2 can stream COPY output straight to the file, skipping ORM rows entirely
+    if engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2":
+        copied = _copy_table_to_csv(model, file_path)
+        logger.info(f"Backed up {copied} records from {model_name}")
+        return
+    
+    with Session(engine) as session:
+        # Stream records in batches so memory stays flat however large the table is
+        query = select(model).execution_options(yield_per=BACKUP_FETCH_SIZE)
+        records = iter(session.exec(query))
+        first_record = next(records, None)
+        
+        if first_record is None:
+            # Create empty file if no records
+            with open(file_path, "w") as f:
+                f.write("")
+            return
+        
+        # Column names come from the model, not from a loaded record
+        columns = list(model.model_fields)
+        # Only these need converting, so rows skip a type check per cell
+        datetime_columns = [column.name for column in model.__table__.columns if isinstance(column.type, sqlalchemy.DateTime)]
+        
+        # Write to CSV; the counter advances once per row handed to the writer
+        counter = count()
+        rows = (
+            _csv_row(record, datetime_columns)
+            for record, _ in zip(chain([first_record], records), counter)
+        )
+        with open(file_path, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+    
+    logger.info(f"Backed up {next(counter)} records from {model_name}")
+
+def _clear_directory(directory: str) -> None:
+    """Remove every file and subdirectory inside directory"""
+    # scandir hands back each entry's path and type, so no join or stat per item
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file():
+                os.unlink(entry.path)
+            elif entry.is_dir():
+                shutil.rmtree(entry.path)
+
+def _copy_contents(source_dir: str, dest_dir: str) -> int:
+    """Copy the files under source_dir into dest_dir, returning the file count"""
+    file_pairs = []
+    for root, _, files in os.walk(source_dir):
+        target = dest_dir if root == source_dir else os.path.join(dest_dir, os.path.relpath(root, source_dir))
+        # Prefixes are joined once per directory instead of twice per file
+        source_prefix = os.path.join(root, "")
+        target_prefix = os.path.join(target, "")
+        file_pairs.extend((source_prefix + name, target_prefix + name) for name in files)
+    
+    # One makedirs per distinct parent up front, so the copy loop never touches mkdir
+    for directory in {os.path.dirname(dest) for _, dest in file_pairs}:
+        os.makedirs(directory, exist_ok=True)
+    
+    # Contents only (in-kernel on Linux); extracted files carry no metadata worth keeping
+    for source, dest in file_pairs:
+        shutil.copyfile(source, dest)
+    
+    return len(file_pairs)
+
 async def create_backup(backup_dir: Optional[str] = None) -> str:
     """Create a full system backup including database and files"""
     # Use configured backup directory if not specified
@@ -27,39 +346,44 @@ async def create_backup(backup_dir: Optional[str] = None) -> str:
     
     # Generate backup filename with timestamp
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    backup_filename = f"hotel_system_backup_{timestamp}.tar.gz"
+    backup_filename = f"{BACKUP_PREFIX}{timestamp}{BACKUP_SUFFIX}"
     backup_path = os.path.join(backup_dir, backup_filename)
     
-    # Create temporary directory for backup files
-    temp_dir = os.path.join(backup_dir, f"temp_backup_{timestamp}")
+    # Top-level directory inside the archive; restore_backup looks for this prefix
+    archive_root = f"temp_backup_{timestamp}"
+    
+    # Only the database dump is staged on disk; files and models are read in place
+    temp_dir = os.path.join(backup_dir, archive_root)
     Path(temp_dir).mkdir(parents=True, exist_ok=True)
     
     try:
-        # Backup database
-        db_backup_path = await backup_database(temp_dir)
-        
-        # Backup uploaded files
-        files_backup_path = await backup_files(temp_dir)
-        
-        # Backup ML models
-        ml_backup_path = await backup_ml_models(temp_dir)
-        
-        # Create backup manifest
-        manifest = {
-            "backup_date": get_current_time().isoformat(),
-            "version": "1.0.0",  # Hardcoded for now
-            "database": os.path.basename(db_backup_path),
-            "files": os.path.basename(files_backup_path),
-            "ml_models": os.path.basename(ml_backup_path)
-        }
-        
-        manifest_path = os.path.join(temp_dir, "manifest.json")
-        with open(manifest_path, "w") as f:
-            json.dump(manifest, f, indent=2)
-        
-        # Create compressed archive
-        with tarfile.open(backup_path, "w:gz") as tar:
-            tar.add(temp_dir, arcname=os.path.basename(temp_dir))
+        # Dump the database on its own thread while files and models are archived
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            db_backup = pool.submit(backup_database, temp_dir)
+            
+            def entries() -> Iterator[Tuple[Union[str, bytes, None], str]]:
+                yield (None, archive_root)
+                
+                # Uploaded files and ML models
+                yield from backup_files(archive_root)
+                yield from backup_ml_models(archive_root)
+                
+                # Only now wait for the database dump
+                db_backup_path = db_backup.result()
+                yield (db_backup_path, f"{archive_root}/database")
+                
+                # Create backup manifest
+                manifest = {
+                    "backup_date": get_current_time().isoformat(),
+                    "version": "1.0.0",  # Hardcoded for now
+                    "database": os.path.basename(db_backup_path),
+                    "files": "files",
+                    "ml_models": "ml_models"
+                }
+                yield (json.dumps(manifest, indent=2).encode(), f"{archive_root}/manifest.json")
+            
+            # Create compressed archive
+            await asyncio.to_thread(_write_archive, backup_path, entries())
         
         logger.info(f"Backup created successfully at {backup_path}")
         
@@ -70,7 +394,7 @@ async def create_backup(backup_dir: Optional[str] = None) -> str:
         if os.path.exists(temp_dir):
             shutil.rmtree(temp_dir)
 
-async def backup_database(backup_dir: str) -> str:
+def backup_database(backup_dir: str) -> str:
     """Backup database to CSV files"""
     db_dir = os.path.join(backup_dir, "database")
     Path(db_dir).mkdir(parents=True, exist_ok=True)
@@ -78,38 +402,9 @@ async def backup_database(backup_dir: str) -> str:
     # Get all model classes to backup
     models = [Guest, Room, Booking, PredictionDataPoint, BackgroundTask, User]
     
-    with Session(engine) as session:
-        for model in models:
-            model_name = model.__name__
-            file_path = os.path.join(db_dir, f"{model_name.lower()}.csv")
-            
-            # Get all records
-            query = select(model)
-            records = session.exec(query).all()
-            
-            if not records:
-                # Create empty file if no records
-                with open(file_path, "w") as f:
-                    f.write("")
-                continue
-            
-            # Get column names from first record
-            first_record = records[0]
-            columns = [col for col in first_record.dict().keys()]
-            
-            # Write to CSV
-            with open(file_path, "w", newline="") as f:
-                writer = csv.DictWriter(f, fieldnames=columns)
-                writer.writeheader()
-                for record in records:
-                    # Convert record to dict and handle any non-serializable values
-                    record_dict = record.dict()
-                    for key, value in record_dict.items():
-                        if isinstance(value, datetime):
-                            record_dict[key] = value.isoformat()
-                    writer.writerow(record_dict)
-            
-            logger.info(f"Backed up {len(records)} records from {model_name}")
+    # Tables dump independently, so a few run at once to keep the database and disk busy
+    with ThreadPoolExecutor(max_workers=BACKUP_DUMP_WORKERS) as executor:
+        list(executor.map(lambda model: _dump_model(model, db_dir), models))
     
     # Create a schema backup
     schema_path = os.path.join(db_dir, "schema.sql")
@@ -126,40 +421,36 @@ async def backup_database(backup_dir: str) -> str:
     logger.info(f"Database schema backed up to {schema_path}")
     return db_dir
 
-async def backup_files(backup_dir: str) -> str:
-    """Backup uploaded files"""
-    files_dir = os.path.join(backup_dir, "files")
-    Path(files_dir).mkdir(parents=True, exist_ok=True)
+def backup_files(archive_root: str) -> List[Tuple[Optional[str], str]]:
+    """Archive entries for uploaded files, read straight from their directories"""
+    files_dir = f"{archive_root}/files"
+    entries = [(None, files_dir)]
     
     # Backup OCR files
     ocr_source = settings.OCR_UPLOAD_DIR
-    if os.path.exists(ocr_source):
-        ocr_dest = os.path.join(files_dir, "ocr")
-        if os.path.exists(ocr_source) and os.listdir(ocr_source):
-            shutil.copytree(ocr_source, ocr_dest)
-            logger.info(f"OCR files backed up from {ocr_source} to {ocr_dest}")
+    if os.path.exists(ocr_source) and os.listdir(ocr_source):
+        entries.append((ocr_source, f"{files_dir}/ocr"))
+        logger.info(f"OCR files backed up from {ocr_source}")
     
     # Backup any other important files
     # Add more file backups as needed
     
-    return files_dir
+    return entries
 
-async def backup_ml_models(backup_dir: str) -> str:
-    """Backup ML models"""
-    ml_dir = os.path.join(backup_dir, "ml_models")
-    Path(ml_dir).mkdir(parents=True, exist_ok=True)
+def backup_ml_models(archive_root: str) -> List[Tuple[Optional[str], str]]:
+    """Archive entries for ML models, read straight from the model directory"""
+    ml_dir = f"{archive_root}/ml_models"
+    entries = [(None, ml_dir)]
     
     # Backup ML model files
     ml_source = settings.ML_MODEL_DIR
-    if os.path.exists(ml_source):
-        ml_dest = os.path.join(ml_dir, "models")
-        if os.path.exists(ml_source) and os.listdir(ml_source):
-            shutil.copytree(ml_source, ml_dest)
-            logger.info(f"ML models backed up from {ml_source} to {ml_dest}")
+    if os.path.exists(ml_source) and os.listdir(ml_source):
+        entries.append((ml_source, f"{ml_dir}/models"))
+        logger.info(f"ML models backed up from {ml_source}")
     
-    return ml_dir
+    return entries
 
-async def restore_backup(backup_path: str, restore_db: bool = True, restore_files: bool = True, restore_ml: bool = True) -> Dict[str, Any]:
+async def restore_backup(backup_path: str, restore_db: bool = True, restore_uploads: bool = True, restore_ml: bool = True) -> Dict[str, Any]:
     """Restore system from backup"""
     if not os.path.exists(backup_path):
         raise FileNotFoundError(f"Backup file not found: {backup_path}")
@@ -170,15 +461,15 @@ async def restore_backup(backup_path: str, restore_db: bool = True, restore_file
     
     try:
         # Extract backup archive
-        with tarfile.open(backup_path, "r:gz") as tar:
-            tar.extractall(path=temp_dir)
+        await asyncio.to_thread(_extract_archive, backup_path, temp_dir)
         
         # Find the backup directory inside the temp directory
-        backup_dirs = [d for d in os.listdir(temp_dir) if os.path.isdir(os.path.join(temp_dir, d)) and d.startswith("temp_backup_")]
+        with os.scandir(temp_dir) as entries:
+            backup_dirs = [entry.path for entry in entries if entry.name.startswith("temp_backup_") and entry.is_dir()]
         if not backup_dirs:
             raise ValueError("Invalid backup format: backup directory not found")
         
-        backup_dir = os.path.join(temp_dir, backup_dirs[0])
+        backup_dir = backup_dirs[0]
         
         # Read manifest
         manifest_path = os.path.join(backup_dir, "manifest.json")
@@ -198,7 +489,7 @@ async def restore_backup(backup_path: str, restore_db: bool = True, restore_file
                 results["database"] = db_result
         
         # Restore files if requested
-        if restore_files:
+        if restore_uploads:
             files_dir = os.path.join(backup_dir, "files")
             if os.path.exists(files_dir):
                 files_result = await restore_files(files_dir)
@@ -236,47 +527,43 @@ async def restore_database(db_dir: str) -> Dict[str, int]:
     
     results = {}
     
-    with Session(engine) as session:
-        # Process each CSV file
-        for model_name, model_class in model_map.items():
-            file_path = os.path.join(db_dir, f"{model_name}.csv")
-            if not os.path.exists(file_path):
-                logger.warning(f"Backup file not found for {model_name}")
-                results[model_name] = 0
-                continue
-            
-            # Check if file is empty
-            if os.path.getsize(file_path) == 0:
-                logger.info(f"Empty backup file for {model_name}, skipping")
-                results[model_name] = 0
-                continue
-            
-            # Clear existing data
-            session.exec(f"DELETE FROM {model_name}")
-            
-            # Read CSV and insert records
-            records = []
-            with open(file_path, "r", newline="") as f:
-                reader = csv.DictReader(f)
-                for row in reader:
-                    # Convert string dates back to datetime
-                    for key, value in row.items():
-                        if value and isinstance(value, str) and "T" in value and "+" in value:
-                            try:
-                                row[key] = datetime.fromisoformat(value)
-                            except ValueError:
-                                pass
-                    
-                    # Create model instance
-                    record = model_class(**row)
-                    records.append(record)
-            
-            # Bulk insert
-            session.add_all(records)
-            session.commit()
-            
-            results[model_name] = len(records)
-            logger.info(f"Restored {len(records)} records to {model_name}")
+    # psycopg2 can feed the CSV straight into COPY, skipping per-row Python work entirely
+    use_copy = engine.dialect.name == "postgresql" and engine.dialect.driver == "psycopg2"
+    
+    # Process each CSV file
+    for model_name, model_class in model_map.items():
+        file_path = os.path.join(db_dir, f"{model_name}.csv")
+        if not os.path.exists(file_path):
+            logger.warning(f"Backup file not found for {model_name}")
+            results[model_name] = 0
+            continue
+        
+        # Check if file is empty
+        if os.path.getsize(file_path) == 0:
+            logger.info(f"Empty backup file for {model_name}, skipping")
+            results[model_name] = 0
+            continue
+        
+        # Clear existing data and load the backup in one transaction per table
+        if use_copy:
+            restored = _copy_csv_to_table(model_class, file_path)
+        else:
+            restored = 0
+            with Session(engine) as session:
+                session.exec(delete(model_class))
+                
+                with open(file_path, "r", newline="") as f:
+                    reader = csv.DictReader(f)
+                    converters = _csv_converters(model_class)
+                    # Core executemany per batch; memory holds one batch, never the whole table
+                    while batch := [_parse_csv_row(row, converters) for row in islice(reader, RESTORE_BATCH_SIZE)]:
+                        session.exec(insert(model_class), params=batch)
+                        restored += len(batch)
+                
+                session.commit()
+        
+        results[model_name] = restored
+        logger.info(f"Restored {restored} records to {model_name}")
     
     return results
 
@@ -296,25 +583,9 @@ async def restore_files(files_dir: str) -> Dict[str, int]:
         Path(ocr_dest).mkdir(parents=True, exist_ok=True)
         
         # Clear existing files
-        for item in os.listdir(ocr_dest):
-            item_path = os.path.join(ocr_dest, item)
-            if os.path.isfile(item_path):
-                os.unlink(item_path)
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
+        _clear_directory(ocr_dest)
         
-        # Copy files
-        file_count = 0
-        for item in os.listdir(ocr_source):
-            source_path = os.path.join(ocr_source, item)
-            dest_path = os.path.join(ocr_dest, item)
-            
-            if os.path.isfile(source_path):
-                shutil.copy2(source_path, dest_path)
-                file_count += 1
-            elif os.path.isdir(source_path):
-                shutil.copytree(source_path, dest_path)
-                file_count += len([f for f in os.listdir(source_path) if os.path.isfile(os.path.join(source_path, f))])
+        file_count = _copy_contents(ocr_source, ocr_dest)
         
         results["ocr_files"] = file_count
         logger.info(f"Restored {file_count} OCR files to {ocr_dest}")
@@ -340,25 +611,9 @@ async def restore_ml_models(ml_dir: str) -> Dict[str, int]:
         Path(ml_dest).mkdir(parents=True, exist_ok=True)
         
         # Clear existing files
-        for item in os.listdir(ml_dest):
-            item_path = os.path.join(ml_dest, item)
-            if os.path.isfile(item_path):
-                os.unlink(item_path)
-            elif os.path.isdir(item_path):
-                shutil.rmtree(item_path)
+        _clear_directory(ml_dest)
         
-        # Copy files
-        file_count = 0
-        for item in os.listdir(ml_source):
-            source_path = os.path.join(ml_source, item)
-            dest_path = os.path.join(ml_dest, item)
-            
-            if os.path.isfile(source_path):
-                shutil.copy2(source_path, dest_path)
-                file_count += 1
-            elif os.path.isdir(source_path):
-                shutil.copytree(source_path, dest_path)
-                file_count += len([f for f in os.listdir(source_path) if os.path.isfile(os.path.join(source_path, f))])
+        file_count = _copy_contents(ml_source, ml_dest)
         
         results["model_files"] = file_count
         logger.info(f"Restored {file_count} ML model files to {ml_dest}")
@@ -374,30 +629,35 @@ async def list_backups(backup_dir: Optional[str] = None) -> List[Dict[str, Any]]
     if not os.path.exists(backup_dir):
         return []
     
+    now = datetime.now()
     backups = []
-    for filename in os.listdir(backup_dir):
-        if filename.startswith("hotel_system_backup_") and filename.endswith(".tar.gz"):
-            file_path = os.path.join(backup_dir, filename)
-            file_stat = os.stat(file_path)
+    # scandir yields the path with each entry and caches its stat
+    with os.scandir(backup_dir) as entries:
+        for entry in entries:
+            filename = entry.name
+            if not (filename.startswith(BACKUP_PREFIX) and filename.endswith(BACKUP_SUFFIX)):
+                continue
+            file_path = entry.path
+            file_stat = entry.stat()
             
             # Extract timestamp from filename
-            timestamp_str = filename.replace("hotel_system_backup_", "").replace(".tar.gz", "")
+            timestamp_str = filename[len(BACKUP_PREFIX):-len(BACKUP_SUFFIX)]
             try:
-                timestamp = datetime.strptime(timestamp_str, "%Y%m%d_%H%M%S")
+                timestamp = _parse_backup_timestamp(timestamp_str)
             except ValueError:
                 timestamp = datetime.fromtimestamp(file_stat.st_mtime)
             
-            backups.append({
+            backups.append((timestamp, {
                 "filename": filename,
                 "path": file_path,
                 "size": file_stat.st_size,
                 "created_at": timestamp.isoformat(),
-                "age_days": (datetime.now() - timestamp).days
-            })
+                "age_days": (now - timestamp).days
+            }))
     
     # Sort by timestamp (newest first)
-    backups.sort(key=lambda x: x["created_at"], reverse=True)
-    return backups
+    backups.sort(key=itemgetter(0), reverse=True)
+    return [backup for _, backup in backups]
 
 async def cleanup_old_backups(max_age_days: int = 30, max_count: int = 10) -> int:
     """Clean up old backups, keeping the newest ones"""
@@ -408,10 +668,8 @@ async def cleanup_old_backups(max_age_days: int = 30, max_count: int = 10) -> in
     
     # Keep only the newest max_count backups
     if len(backups) > max_count:
-        # Sort by age (oldest first)
-        backups.sort(key=lambda x: x["created_at"])
-        # Mark excess backups for deletion
-        excess_backups = backups[:(len(backups) - max_count)]
+        # list_backups returns newest first, so the excess is everything past max_count
+        excess_backups = backups[max_count:]
         # Combine with old backups, avoiding duplicates
         backups_to_delete = list({b["path"]: b for b in old_backups + excess_backups}.values())
     else:
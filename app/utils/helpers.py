@@ -1,5 +1,6 @@
 import os
 import uuid
+import time
 import csv
 import shutil
 import tempfile
@@ -13,10 +14,13 @@ import numpy as np
 from app.config.config import settings
 from loguru import logger
 
+# Bound once; get_current_time runs on nearly every write
+_UTCNOW = datetime.utcnow
+
 # Date and time helpers
 def get_current_time() -> datetime:
     """Get current UTC time"""
-    return datetime.utcnow()
+    return _UTCNOW()
 
 def format_date(date: datetime, format_str: str = "%Y-%m-%d") -> str:
     """Format date to string"""
@@ -29,7 +33,13 @@ def parse_date(date_str: str, format_str: str = "%Y-%m-%d") -> datetime:
 def get_date_range(start_date: datetime, end_date: datetime) -> List[datetime]:
     """Get list of dates between start and end date"""
     delta = end_date - start_date
-    return [start_date + timedelta(days=i) for i in range(delta.days + 1)]
+    if start_date.tzinfo is not None:
+        # numpy datetimes are naive; keep aware ranges on the plain path
+        return [start_date + timedelta(days=i) for i in range(delta.days + 1)]
+    
+    # One vectorized add; tolist() builds the datetime objects in C
+    days = np.arange(max(delta.days + 1, 0), dtype="timedelta64[D]")
+    return (np.datetime64(start_date, "us") + days).tolist()
 
 def is_weekend(date: datetime) -> bool:
     """Check if date is weekend (Saturday or Sunday)"""
@@ -60,6 +70,14 @@ def generate_unique_filename(original_filename: str) -> str:
     ext = os.path.splitext(original_filename)[1]
     return f"{uuid.uuid4()}{ext}"
 
+def generate_task_id() -> str:
+    """Generate a time-ordered UUIDv7 string so new task ids land at the end of the index"""
+    # 48-bit millisecond timestamp, version 7, variant 10, remaining bits random
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = value & ~(0xF << 76) | 0x7 << 76
+    value = value & ~(0x3 << 62) | 0x2 << 62
+    return str(uuid.UUID(int=value))
+
 def read_csv_file(file_path: Union[str, Path]) -> List[Dict[str, Any]]:
     """Read CSV file and return list of dictionaries"""
     data = []
@@ -70,6 +88,9 @@ def read_csv_file(file_path: Union[str, Path]) -> List[Dict[str, Any]]:
     return data
 
 # Image processing helpers for OCR
+# Grayscale lookup table: pixels above 150 become white, the rest black
+_OCR_THRESHOLD_LUT = [0] * 151 + [255] * 105
+
 def preprocess_image_for_ocr(image_path: Union[str, Path]) -> np.ndarray:
     """Preprocess image for OCR to improve text recognition"""
     # Read image with PIL instead of cv2
@@ -78,13 +99,10 @@ def preprocess_image_for_ocr(image_path: Union[str, Path]) -> np.ndarray:
     # Convert to grayscale
     gray = img.convert('L')
     
-    # Convert to numpy array
-    gray_array = np.array(gray)
-    
-    # Apply simple threshold
-    binary = np.where(gray_array > 150, 255, 0)
+    # Apply simple threshold in Pillow's C lookup, then hand the pixels to numpy once
+    binary = gray.point(_OCR_THRESHOLD_LUT)
     
-    return binary
+    return np.asarray(binary)
 
 def enhance_image_for_ocr(image_path: Union[str, Path], output_path: Optional[Union[str, Path]] = None) -> Union[str, Path]:
     """Enhance image for OCR and save to output path"""
@@ -0,0 +1,31 @@
+"""Add partial index on active booking checkin_at
+
+Revision ID: 2e9a7b3c5d14
+Revises: 8c1f4d6e2a37
+Create Date: 2026-10-15 10:41:52.903116
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '2e9a7b3c5d14'
+down_revision = '8c1f4d6e2a37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_booking_active_checkin_at', ['checkin_at'], unique=False,
+            postgresql_where=sa.text('checkout_at IS NULL'),
+            sqlite_where=sa.text('checkout_at IS NULL')
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index('ix_booking_active_checkin_at')
@@ -0,0 +1,37 @@
+"""Add room and booking filter indexes
+
+Revision ID: 4f6a2c8e1b95
+Revises: 7d4b1e9c3a52
+Create Date: 2026-10-15 12:14:52.603218
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '4f6a2c8e1b95'
+down_revision = '7d4b1e9c3a52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('room', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_room_occupied'), ['occupied'], unique=False)
+        batch_op.create_index('ix_room_type_occupied', ['room_type', 'occupied'], unique=False)
+
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_booking_checkin_at'), ['checkin_at'], unique=False)
+        batch_op.create_index(batch_op.f('ix_booking_checkout_at'), ['checkout_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_booking_checkout_at'))
+        batch_op.drop_index(batch_op.f('ix_booking_checkin_at'))
+
+    with op.batch_alter_table('room', schema=None) as batch_op:
+        batch_op.drop_index('ix_room_type_occupied')
+        batch_op.drop_index(batch_op.f('ix_room_occupied'))
@@ -0,0 +1,39 @@
+"""Add booking duration_days
+
+Revision ID: 5b7e2c91a4f0
+Revises: d3a16ebea093
+Create Date: 2026-10-15 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7e2c91a4f0'
+down_revision = 'd3a16ebea093'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('duration_days', sa.Integer(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_booking_duration_days'), ['duration_days'], unique=False)
+
+    # Backfill completed bookings; same-day stays count as one day
+    if op.get_bind().dialect.name == 'sqlite':
+        days = "CAST(julianday(checkout_at) - julianday(checkin_at) AS INTEGER)"
+    else:
+        days = "CAST(EXTRACT(day FROM checkout_at - checkin_at) AS INTEGER)"
+    op.execute(
+        f"UPDATE booking SET duration_days = CASE WHEN {days} < 1 THEN 1 ELSE {days} END "
+        "WHERE checkout_at IS NOT NULL"
+    )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('booking', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_booking_duration_days'))
+        batch_op.drop_column('duration_days')
@@ -0,0 +1,29 @@
+"""Add guest email and phone indexes
+
+Revision ID: 7d4b1e9c3a52
+Revises: 2e9a7b3c5d14
+Create Date: 2026-10-15 11:26:08.351447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '7d4b1e9c3a52'
+down_revision = '2e9a7b3c5d14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('guest', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_guest_email'), ['email'], unique=False)
+        batch_op.create_index(batch_op.f('ix_guest_phone'), ['phone'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('guest', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_guest_phone'))
+        batch_op.drop_index(batch_op.f('ix_guest_email'))
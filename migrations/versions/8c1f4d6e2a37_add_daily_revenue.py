@@ -0,0 +1,33 @@
+"""Add daily revenue cache table
+
+Revision ID: 8c1f4d6e2a37
+Revises: 5b7e2c91a4f0
+Create Date: 2026-10-15 10:03:17.482915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1f4d6e2a37'
+down_revision = '5b7e2c91a4f0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Rows are filled lazily by BookingService.get_revenue_stats
+    op.create_table('dailyrevenue',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('total', sa.Float(), nullable=False),
+    sa.Column('bookings', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('dailyrevenue')
@@ -0,0 +1,38 @@
+"""Add password reset token table
+
+Revision ID: 9a3e5f7c2d81
+Revises: 4f6a2c8e1b95
+Create Date: 2026-10-15 13:02:41.775310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = '9a3e5f7c2d81'
+down_revision = '4f6a2c8e1b95'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('passwordresettoken',
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.Column('token', sqlmodel.sql.sqltypes.AutoString(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('expires_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('token')
+    )
+    with op.batch_alter_table('passwordresettoken', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_passwordresettoken_user_id'), ['user_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('passwordresettoken', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_passwordresettoken_user_id'))
+
+    op.drop_table('passwordresettoken')
@@ -0,0 +1,29 @@
+"""Add background task status indexes
+
+Revision ID: b6d2e8f4a1c7
+Revises: 9a3e5f7c2d81
+Create Date: 2026-10-15 13:40:19.208734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import sqlmodel
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6d2e8f4a1c7'
+down_revision = '9a3e5f7c2d81'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('backgroundtask', schema=None) as batch_op:
+        batch_op.create_index('ix_bgtask_status_created', ['status', 'created_at'], unique=False)
+        batch_op.create_index('ix_bgtask_status_completed', ['status', 'completed_at'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('backgroundtask', schema=None) as batch_op:
+        batch_op.drop_index('ix_bgtask_status_completed')
+        batch_op.drop_index('ix_bgtask_status_created')